@@ -0,0 +1,313 @@
+"""
+Long-running analysis server for large position sets: clients stream positions over a local socket and get the best
+move, score and principal variation back, while a pool of worker processes keeps its imports, move tables,
+transposition tables and move ordering tables warm from one request to the next.
+
+    python AnalysisServer.py --port 8765 --workers 4
+    python AnalysisServer.py --unix /tmp/analysis.sock --workers 8 --hash 64
+    python AnalysisServer.py --connect 127.0.0.1:8765 --depth 5 < positions.fen      (client: one FEN per line)
+
+Requests and responses are JSON, one object per line. A request needs a fen and may set id (echoed back), depth,
+movetime (milliseconds) and nodes, each at least 1:
+
+    {"id": 7, "fen": "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3", "depth": 6, "movetime": 2000}
+    {"id": 7, "bestmove": "f1b5", "san": "Bb5", "score": "cp 30", "depth": 6, "pv": ["f1b5", ...], "nodes": 51234,
+     "ms": 812}
+
+score is from the side to move's point of view, as in UCI ("cp <centipawns>" or "mate <moves>"). A position with no
+legal moves gets a null bestmove and "checkmate" or "stalemate" as its score; a bad request gets {"id": ..., "error":
+"..."}. Responses on a connection come back in request order.
+
+Backpressure: a connection may have at most --max-pending requests in flight. Past that the server stops reading the
+socket until one is answered, so a client streaming a big file is slowed down instead of buffered without bound.
+Timeouts: every search stops at its movetime, or at --timeout if it has none, and never runs past --timeout. The
+clock starts when a worker picks the request up, not when it is read, so requests queued behind others get their full
+time. A result that has still not arrived TIMEOUT_GRACE_MS after that, because its worker died or hung, is answered
+with a timeout error. Requests still queued when their client closes the connection are skipped by the workers; a
+client that only shuts down its sending side still gets every answer.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import select
+import socket
+import socketserver
+import sys
+import threading
+import time
+import AutomatedMoveFinder
+import Notation
+from BitboardEngine import backends
+from UCI import uciScore
+
+DEFAULT_DEPTH = 64 #without a depth the search deepens until its time runs out
+DEFAULT_TIMEOUT_MS = 10000
+DEFAULT_MAX_PENDING = 64
+TIMEOUT_GRACE_MS = 2000 #how long past its time limit a search may take to unwind and send its result
+CLOSE_POLL_MS = 100 #how often a connection whose client has stopped sending is checked for having closed
+
+workerGameState = None #the GameState of a worker process, reloaded from each request's FEN
+workerSearcher = None #the worker's Searcher, whose tables stay warm between requests
+workerDepth = 0 #depth of the last iteration the worker's search finished
+
+def initWorker(gameStateClass, hashSizeMB):
+    global workerGameState, workerSearcher
+    workerGameState = gameStateClass()
+    workerSearcher = AutomatedMoveFinder.Searcher(hashSizeMB)
+    workerSearcher.onIteration = recordIteration
+
+def recordIteration(depth, score, principalVariation):
+    global workerDepth
+    workerDepth = depth
+
+"""
+Runs in a worker: searches fen by iterative deepening up to depth, stopping at timeLimitMs or nodeLimit, and returns
+the response for the request (without its id). timeLimitMs counts from here, when the worker starts on the request,
+and the start is written to startTimes[sequence] for the responder's timeout. dropped is the connection's Event, set
+once its client has gone; such a request is skipped and None returned.
+"""
+def analysePosition(fen, depth, timeLimitMs, nodeLimit, dropped, startTimes, sequence):
+    global workerDepth
+    if dropped.is_set():
+        return None
+    startTimes[sequence] = time.time()
+    gs = workerGameState
+    searcher = workerSearcher
+    start = time.perf_counter()
+    try:
+        gs.load_fen(fen)
+        validMoves = gs.getValidMoves()
+    except Exception as error: #whatever a bad position trips over, it is that request's error, not the worker's
+        return {"error": "bad fen: %s" % error}
+    if not validMoves:
+        return {"bestmove": None, "san": None, "score": "checkmate" if gs.checkMate else "stalemate", "depth": 0,
+                "pv": [], "nodes": 0, "ms": 0}
+    workerDepth = 0
+    move = searcher.bestMoveIterativeDeepening(gs, list(validMoves), timeLimitMs, nodeLimit, depth)
+    principalVariation = searcher.principalVariation or [move]
+    return {"bestmove": Notation.moveToUci(move), "san": Notation.moveToSan(gs, move, validMoves),
+            "score": uciScore(searcher.bestScore, principalVariation), "depth": workerDepth,
+            "pv": [Notation.moveToUci(pvMove) for pvMove in principalVariation], "nodes": searcher.nodeCount,
+            "ms": round((time.perf_counter() - start) * 1000)}
+
+"""
+The value of request[name] as an int, or None if it is absent or null. Raises ValueError below 1, since a zero depth,
+movetime or node count would otherwise quietly mean something else.
+"""
+def positiveInt(request, name):
+    value = request.get(name)
+    if value is None:
+        return None
+    value = int(value)
+    if value < 1:
+        raise ValueError("%s must be at least 1" % name)
+    return value
+
+class AnalysisHandler(socketserver.StreamRequestHandler):
+    """
+    Serves one connection: this thread reads requests and hands them to the pool, and a second thread writes the
+    responses in order as they are ready.
+    """
+    def handle(self):
+        analysis = self.server.analysis
+        self.inFlight = threading.BoundedSemaphore(analysis.maxPending)
+        self.dropped = analysis.manager.Event() #set when the client goes away, so the workers skip what is queued
+        self.startTimes = analysis.manager.dict() #request sequence number to the time a worker started on it
+        self.pending = queue.Queue()
+        responder = threading.Thread(target=self.respond, daemon=True)
+        responder.start()
+        for sequence, line in enumerate(self.rfile):
+            if not line.strip():
+                continue
+            self.inFlight.acquire() #blocks while maxPending requests are unanswered, which is the backpressure
+            self.pending.put((sequence,) + analysis.submit(line, self.dropped, self.startTimes, sequence))
+        self.pending.put(None)
+        self.watchForClose(responder)
+        responder.join()
+
+    """
+    Called once the client has stopped sending: until the responder is done, sets dropped as soon as the client has
+    closed the connection altogether rather than only its sending side, so the workers skip what is still queued for
+    it. The close shows as a hang-up or error on the socket, on a Unix socket at once and on TCP once the client has
+    refused a response with a reset.
+    """
+    def watchForClose(self, responder):
+        if not hasattr(select, "poll"):
+            return #the write that fails still sets dropped, see respond
+        poller = select.poll()
+        poller.register(self.connection, select.POLLHUP | select.POLLERR)
+        while responder.is_alive():
+            if poller.poll(CLOSE_POLL_MS):
+                self.dropped.set()
+                return
+
+    def respond(self):
+        connected = True
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            sequence, requestID, asyncResult, response = item
+            if asyncResult is not None:
+                response = self.waitForResult(asyncResult, sequence, response)
+            #after the client goes away the remaining results are only waited for and dropped (the workers return None
+            #for those they skipped)
+            if connected and response is not None:
+                try:
+                    self.wfile.write((json.dumps(dict({"id": requestID}, **response)) + "\n").encode())
+                    self.wfile.flush()
+                except OSError:
+                    connected = False
+                    self.dropped.set()
+            self.inFlight.release()
+
+    """
+    The response of a request sent to the pool with a time limit of timeLimitMs. The search keeps to its limit itself;
+    the wait gives up TIMEOUT_GRACE_MS past it, counted from when the worker started (a request still queued behind
+    others is waited for however long the queue takes), which only happens if the worker died or hung. An exception in
+    the worker becomes an error response too, so the connection carries on.
+    """
+    def waitForResult(self, asyncResult, sequence, timeLimitMs):
+        timeout = (timeLimitMs + TIMEOUT_GRACE_MS) / 1000
+        try:
+            asyncResult.wait(timeout)
+            while not asyncResult.ready():
+                started = self.startTimes.get(sequence)
+                remaining = timeout if started is None else started + timeout - time.time()
+                if remaining <= 0:
+                    return {"error": "timeout"}
+                asyncResult.wait(remaining)
+            return asyncResult.get()
+        except Exception as error:
+            return {"error": "analysis failed: %s" % error}
+        finally:
+            self.startTimes.pop(sequence, None)
+
+class TcpServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+class AnalysisServer:
+    """
+    address is (host, port), or a socket path when unixSocket is True. workers defaults to the number of CPUs; each
+    worker has a transposition table of hashSizeMB.
+    """
+    def __init__(self, address, workers=None, hashSizeMB=AutomatedMoveFinder.HASH_SIZE_MB,
+                 maxPending=DEFAULT_MAX_PENDING, timeoutMs=DEFAULT_TIMEOUT_MS, backend="bitboard", unixSocket=False):
+        self.maxPending = maxPending
+        self.timeoutMs = timeoutMs
+        self.manager = multiprocessing.Manager() #serves the connections' dropped Events to the workers
+        self.pool = multiprocessing.Pool(workers or os.cpu_count() or 1, initializer=initWorker,
+                                         initargs=(backends[backend], hashSizeMB))
+        if unixSocket:
+            if os.path.exists(address):
+                os.unlink(address) #left over from an earlier run
+            self.server = UnixServer(address, AnalysisHandler)
+        else:
+            self.server = TcpServer(address, AnalysisHandler)
+        self.server.analysis = self
+
+    """
+    Parses one request line and sends it to the pool, to be skipped if dropped (the connection's Event) is set before a
+    worker gets to it; the worker records its start in startTimes under sequence. Returns (id, asyncResult, time limit
+    in milliseconds), or (id, None, error response) for a request that cannot be run.
+    """
+    def submit(self, line, dropped, startTimes, sequence):
+        requestID = None
+        try:
+            request = json.loads(line)
+            requestID = request.get("id")
+            fen = request["fen"]
+            if not isinstance(fen, str):
+                raise TypeError("fen must be a string")
+            depth, movetime, nodeLimit = (positiveInt(request, name) for name in ("depth", "movetime", "nodes"))
+            depth = DEFAULT_DEPTH if depth is None else depth
+            timeLimitMs = self.timeoutMs if movetime is None else min(movetime, self.timeoutMs)
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            return requestID, None, {"error": "bad request: %s" % error}
+        asyncResult = self.pool.apply_async(analysePosition, (fen, depth, timeLimitMs, nodeLimit, dropped, startTimes,
+                                                              sequence))
+        return requestID, asyncResult, timeLimitMs
+
+    def serveForever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def close(self):
+        self.server.server_close()
+        self.pool.terminate()
+        self.pool.join()
+        self.manager.shutdown()
+
+"""
+Client side: sends each FEN in fens with the limits (a dict of depth, movetime and nodes) to the server at address and
+yields the responses as dicts. The requests are written from a separate thread, so the server's backpressure just
+slows the sending down.
+"""
+def analyseFens(fens, address, limits, unixSocket=False):
+    connection = socket.socket(socket.AF_UNIX if unixSocket else socket.AF_INET, socket.SOCK_STREAM)
+    connection.connect(address)
+    def sendRequests():
+        with connection.makefile("w") as requests:
+            for i, fen in enumerate(fens):
+                requests.write(json.dumps(dict({"id": i + 1, "fen": fen}, **limits)) + "\n")
+        connection.shutdown(socket.SHUT_WR)
+    sender = threading.Thread(target=sendRequests, daemon=True)
+    sender.start()
+    with connection.makefile("r") as responses:
+        for line in responses:
+            yield json.loads(line)
+    sender.join()
+    connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse positions sent over a local socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on (or connect to) a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--hash", type=int, default=AutomatedMoveFinder.HASH_SIZE_MB, help="MB per worker")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING, help="requests in flight per connection")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT_MS, help="longest search in milliseconds")
+    parser.add_argument("--backend", choices=sorted(backends), default="bitboard")
+    parser.add_argument("--connect", metavar="HOST:PORT", nargs="?", const="",
+                        help="act as a client: analyse the FENs on stdin (one per line) with the limits below")
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--movetime", type=int)
+    parser.add_argument("--nodes", type=int)
+    args = parser.parse_args()
+    if args.connect is not None:
+        if args.unix:
+            address = args.unix
+        else:
+            host, _, port = args.connect.rpartition(":")
+            address = (host or args.host, int(port) if port else args.port)
+        limits = {name: value for name, value in (("depth", args.depth), ("movetime", args.movetime),
+                                                  ("nodes", args.nodes)) if value is not None}
+        fens = (line.strip() for line in sys.stdin if line.strip())
+        for response in analyseFens(fens, address, limits, args.unix is not None):
+            print(json.dumps(response), flush=True)
+        return
+    address = args.unix if args.unix else (args.host, args.port)
+    server = AnalysisServer(address, args.workers, args.hash, args.max_pending, args.timeout, args.backend,
+                            args.unix is not None)
+    print("analysing on %s with %d workers" % (address if args.unix else "%s:%d" % address,
+          args.workers or os.cpu_count() or 1), file=sys.stderr)
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == "__main__":
+    main()
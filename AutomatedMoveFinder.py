@@ -1,62 +1,22 @@
 import random
-pieceScore = {'Q':9, 'R':5, 'B':3, 'N':3, 'p':1, 'K':0}
-
-knightScores = [[1, 1, 1, 1, 1, 1, 1, 1],
-                [1, 2, 2, 2, 2, 2, 2, 1],
-                [1, 2, 3, 3, 3, 3, 2, 1],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [1, 2, 3, 3, 3, 3, 2, 1],
-                [1, 2, 2, 2, 2, 2, 2, 1],
-                [1, 1, 1, 1, 1, 1, 1, 1]]
-
-bishopScores = [[4, 3, 2, 1, 1, 2, 3, 4],
-                [3, 4, 3, 2, 2, 3, 4, 3],
-                [2, 3, 4, 3, 3, 4, 3, 2],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [2, 3, 4, 3, 3, 4, 3, 2],
-                [3, 4, 3, 2, 2, 3, 4, 3],
-                [4, 3, 2, 1, 1, 2, 3, 4]]
-
-queenScores = [[1, 1, 1, 3, 1, 1, 1, 1],
-               [1, 2, 3, 3, 3, 1, 1, 1],
-               [1, 4, 3, 3, 3, 4, 2, 1],
-               [1, 2, 3, 3, 3, 2, 2, 1],
-               [1, 2, 3, 3, 3, 2, 2, 1],
-               [1, 4, 3, 3, 3, 4, 2, 1],
-               [1, 2, 3, 3, 3, 1, 1, 1],
-               [1, 1, 1, 3, 1, 1, 1, 1]]
-
-rookScores = [[4, 3, 4, 4, 4, 4, 3, 4],
-              [4, 4, 4, 4, 4, 4, 4, 4],
-              [1, 1, 2, 3, 3, 2, 1, 1],
-              [1, 2, 3, 4, 4, 3, 2, 1],
-              [1, 2, 3, 4, 4, 3, 2, 1],
-              [1, 1, 2, 3, 3, 2, 1, 1],
-              [4, 4, 4, 4, 4, 4, 4, 4],
-              [4, 3, 4, 4, 4, 4, 3, 4]]
-
-whitePawnScores = [[8, 8, 8, 8, 8, 8, 8, 8],
-                   [8, 8, 8, 8, 8, 8, 8, 8],
-                   [5, 6, 6, 7, 7, 6, 6, 5],
-                   [2, 3, 3, 5, 5, 3, 3, 2],
-                   [1, 2, 3, 4, 4, 3, 2, 1],
-                   [1, 1, 2, 3, 3, 2, 1, 1],
-                   [1, 1, 1, 0, 0, 1, 1, 1],
-                   [0, 0, 0, 0, 0, 0, 0, 0]]
-
-blackPawnScores = whitePawnScores[::-1]
-
-piecePositionScores = {"N": knightScores, "B": bishopScores, "R": rookScores, "Q":queenScores, "wp": whitePawnScores, "bp":blackPawnScores}
-                
+import time
+from TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from MoveOrdering import MoveOrderer
+from PieceScores import pieceScore, knightScores, bishopScores, queenScores, rookScores, whitePawnScores, \
+    blackPawnScores, piecePositionScores
 
 CHECKMATE = 1000
 STALEMATE = 0
 MAX_DEPTH = 2
+HASH_SIZE_MB = 16
+LIMIT_CHECK_INTERVAL = 256 #nodes between two looks at the clock
+MAX_QUIESCENCE_DEPTH = 8 #safety cap on how many captures deep the quiescence search may go
+DELTA_MARGIN = 2 #a capture has to be able to bring the score to within two pawns of alpha to be searched
+NULL_WINDOW = .05 #width of the principal variation search's null windows; scores are multiples of a tenth of a pawn
+ASPIRATION_WINDOW = .5 #half width of the first window around the previous iteration's score
+
 def makeRandomMove(validMoves):
     return validMoves[random.randint(0, len(validMoves)-1)]
-nextMove = None
 '''
 for black:
 assuming worst possible score for black is +1000, so initially, maxScore = +1000
@@ -72,7 +32,7 @@ So, initially, setting maxScore to a large negative value(-1000 in this case) an
 '''
 def makeBestMove(gs, validMoves):
     bestMove = None
-    turn = 1 if gs.whiteToMove else -1 
+    turn = 1 if gs.whiteToMove else -1
     opponentMinMax = CHECKMATE
     random.shuffle(validMoves)
     for playerMove in validMoves:
@@ -86,13 +46,13 @@ def makeBestMove(gs, validMoves):
             opponentMax = -CHECKMATE
             for opponentMove in opponentMoves:
                 gs.makeMove(opponentMove)
-                gs.getValidMoves()
+                gs.hasLegalMove()
                 if gs.checkMate:
                     score = CHECKMATE
                 elif gs.staleMate:
                     score = STALEMATE
                 else:
-                    score = (-turn * board_score(gs.board)) 
+                    score = (-turn * board_score(gs))
                 if opponentMax < score:
                     opponentMax = score
                 gs.undoMove()
@@ -103,126 +63,477 @@ def makeBestMove(gs, validMoves):
     return bestMove
 
 """
-Mini Max 
+Everything one search needs besides the GameState: its transposition table and move ordering tables, the limits it
+runs under, and what it found (best move, score, principal variation, node count). Searchers share nothing, so any
+number of them can search different games in one process, each from its own thread if need be. The module level
+functions below keep working as before through defaultSearcher.
 """
-def bestMoveMinMax(gs, validMoves):
-    global nextMove
-    minMaxMoveFind(gs, validMoves, MAX_DEPTH, gs.whiteToMove)
-    return nextMove
-
-def minMaxMoveFind(gs, validMoves, depth, whiteToMove):
-    global nextMove
-    if depth == 0:
-        return board_score(gs)
-    else:
-        random.shuffle(validMoves)
-        if whiteToMove:
+class Searcher:
+    def __init__(self, hashSizeMB=HASH_SIZE_MB, verbose=False, evaluate=None, book=None):
+        self.transpositionTable = TranspositionTable(hashSizeMB)
+        self.book = book #an OpeningBook consulted before searching, or None
+        self.evaluate = evaluate or board_score #static evaluation, white minus black, called as evaluate(gs)
+        self.moveOrderer = MoveOrderer(pieceScore)
+        self.verbose = verbose #print a line about every finished search
+        self.stats = None #a SearchStats that records every alpha-beta search, None to record nothing
+        self.bestMove = None #best root move of the current or last search
+        self.bestScore = 0
+        self.principalVariation = []
+        #the depth the current root search started at, how many nodes it has visited and the limits that may stop it
+        self.searchDepth = MAX_DEPTH
+        self.nodeCount = 0
+        self.searchDeadline = None #time.perf_counter() value after which the search stops, None for no time limit
+        self.searchNodeLimit = None
+        self.searchStopped = False
+        #an Event (threading or multiprocessing) that stops the search once set, polled along with the clock; lets
+        #another process stop a search, where stop() only works within this one
+        self.stopEvent = None
+        self.onIteration = None #called as onIteration(depth, score, principalVariation) after each iteration
+
+    def setHashSize(self, sizeMB):
+        self.transpositionTable.resize(sizeMB)
+
+    """
+    Asks the running search to stop; it unwinds within a few nodes. Meant to be called from another thread, e.g. the GUI
+    cancelling a background search. The caller should wait for the search thread to finish before starting a new
+    search, since a search that had not yet started when this was called resets the flag and runs anyway.
+    """
+    def stop(self):
+        self.searchStopped = True
+
+    """
+    If the opening book has a move for gs, makes it the result of the search (with no nodes searched) and returns it;
+    otherwise returns None and the caller searches.
+    """
+    def probeBook(self, gs, validMoves):
+        move = self.book.findMove(gs, validMoves) if self.book is not None else None
+        if move is not None:
+            self.bestMove, self.bestScore, self.principalVariation = move, 0, [move]
+            self.nodeCount = 0
+        return move
+
+    """
+    Resets the per-search state before a new root search.
+    """
+    def startSearch(self, depth, timeLimitMs=None, nodeLimit=None):
+        self.transpositionTable.newSearch()
+        self.moveOrderer.newSearch()
+        self.searchDepth = depth
+        self.nodeCount = 0
+        self.searchDeadline = time.perf_counter() + timeLimitMs / 1000 if timeLimitMs is not None else None
+        self.searchNodeLimit = nodeLimit
+        self.searchStopped = False
+        self.bestMove = None
+        self.bestScore = 0
+        self.principalVariation = []
+
+    """
+    Mini Max
+    """
+    def bestMoveMinMax(self, gs, validMoves, depth=MAX_DEPTH):
+        self.startSearch(depth)
+        self.bestScore = self.minMaxMoveFind(gs, validMoves, depth, gs.whiteToMove)
+        return self.bestMove
+
+    def minMaxMoveFind(self, gs, validMoves, depth, whiteToMove):
+        self.nodeCount += 1
+        if depth == 0:
+            return self.evaluate(gs)
+        else:
+            random.shuffle(validMoves)
+            if whiteToMove:
+                maxScore = -CHECKMATE
+                for move in validMoves:
+                    gs.makeMove(move)
+                    oppMoves = gs.getValidMoves()
+                    score = self.minMaxMoveFind(gs, oppMoves, depth - 1, False)
+                    if score > maxScore:
+                        maxScore = score
+                        if depth == self.searchDepth:
+                            self.bestMove = move
+                    gs.undoMove()
+                return maxScore
+            else:
+                minScore = CHECKMATE
+                for move in validMoves:
+                    gs.makeMove(move)
+                    oppMoves = gs.getValidMoves()
+                    score = self.minMaxMoveFind(gs, oppMoves, depth - 1, True)
+                    if score < minScore:
+                        minScore = score
+                        if depth == self.searchDepth:
+                            self.bestMove = move
+                    gs.undoMove()
+                return minScore
+
+    """
+    Nega Max
+    """
+    def bestMoveNegaMax(self, gs, validMoves, depth=MAX_DEPTH):
+        turn = 1 if gs.whiteToMove else -1
+        self.startSearch(depth)
+        self.bestScore = self.negMaxMoveFind(gs, validMoves, depth, turn)
+        return self.bestMove
+
+    def negMaxMoveFind(self, gs, validMoves, depth, turn):
+        self.nodeCount += 1
+        if depth == 0:
+            return turn * self.evaluate(gs)
+        else:
             maxScore = -CHECKMATE
             for move in validMoves:
                 gs.makeMove(move)
                 oppMoves = gs.getValidMoves()
-                score = minMaxMoveFind(gs, oppMoves, depth - 1, False)
-                if score > maxScore:
+                score = -self.negMaxMoveFind(gs, oppMoves, depth - 1, -turn)
+                if score > maxScore: # if a < b then -a > -b
                     maxScore = score
-                    if depth == MAX_DEPTH:
-                        nextMove = move
+                    if depth == self.searchDepth:
+                        self.bestMove = move
                 gs.undoMove()
             return maxScore
+
+    """
+    Alpha Beta Pruning
+    """
+    def bestMoveNegaMaxAplhaBeta(self, gs, validMoves, depth=MAX_DEPTH):
+        if self.probeBook(gs, validMoves) is not None:
+            return self.bestMove
+        turn = 1 if gs.whiteToMove else -1
+        random.shuffle(validMoves)
+        self.startSearch(depth)
+        if self.stats is not None:
+            self.stats.start(gs, self)
+        try:
+            self.bestScore = self.negMaxMoveFindAlphaBeta(gs, validMoves, depth, -CHECKMATE, CHECKMATE, turn)
+            if not self.searchStopped:
+                self.principalVariation = self.getPrincipalVariation(gs, depth)
+                if self.stats is not None:
+                    self.stats.endIteration(depth, self.bestScore, self.bestMove, self.nodeCount)
+        finally:
+            if self.stats is not None:
+                self.stats.finish(gs, self)
+        self.reportSearch()
+        return self.bestMove
+
+    """
+    Iterative deepening: search depth 1, 2, 3, ... until the time limit (milliseconds) or node limit runs out, and
+    return the best move of the last iteration that finished. Each iteration starts from the previous best move, and the
+    transposition table carries the rest of the previous principal variation, so the deeper searches are ordered well.
+    From depth 2 on the root is searched with an aspiration window around the previous score (see aspirationSearch).
+    """
+    def bestMoveIterativeDeepening(self, gs, validMoves, timeLimitMs=None, nodeLimit=None, maxDepth=64):
+        if self.probeBook(gs, validMoves) is not None:
+            return self.bestMove
+        turn = 1 if gs.whiteToMove else -1
+        random.shuffle(validMoves)
+        startTime = time.perf_counter()
+        self.startSearch(1, timeLimitMs, nodeLimit)
+        if self.stats is not None:
+            self.stats.start(gs, self)
+        bestMove = None
+        bestScore = 0
+        try:
+            for depth in range(1, maxDepth + 1):
+                self.searchDepth = depth
+                self.bestMove = None
+                if bestMove is not None:
+                    validMoves = orderTTMoveFirst(validMoves, bestMove.moveID)
+                score = self.aspirationSearch(gs, validMoves, depth, bestScore if depth > 1 else None, turn)
+                if self.searchStopped:
+                    break #the unfinished iteration is thrown away
+                bestMove, bestScore = self.bestMove, score
+                self.principalVariation = self.getPrincipalVariation(gs, depth)
+                if self.stats is not None:
+                    self.stats.endIteration(depth, score, bestMove, self.nodeCount)
+                if self.onIteration is not None:
+                    self.onIteration(depth, score, self.principalVariation)
+                if abs(score) >= CHECKMATE or len(validMoves) <= 1:
+                    break #a forced mate or a forced move will not change with more depth
+                #the next iteration takes several times as long as this one, so do not start it if it cannot finish
+                if self.searchDeadline is not None and \
+                        time.perf_counter() + (time.perf_counter() - startTime) > self.searchDeadline:
+                    break
+        finally:
+            if self.stats is not None:
+                self.stats.finish(gs, self)
+        self.searchDeadline = self.searchNodeLimit = None
+        self.bestMove = bestMove if bestMove is not None else (validMoves[0] if validMoves else None)
+        self.bestScore = bestScore
+        self.reportSearch()
+        return self.bestMove
+
+    """
+    Root search of one iteration with an aspiration window: the score rarely moves far from the previous iteration's,
+    so the root is first searched with a narrow window around previousScore, which cuts off more. A score on or outside
+    the window is only a bound, so the search is repeated with that side of the window widened, twice as far each
+    time, until the score lands inside it. Without a previous score, or near a mate score, the window is the full one.
+    """
+    def aspirationSearch(self, gs, validMoves, depth, previousScore, turn):
+        if previousScore is None or abs(previousScore) >= CHECKMATE - ASPIRATION_WINDOW:
+            return self.negMaxMoveFindAlphaBeta(gs, validMoves, depth, -CHECKMATE, CHECKMATE, turn)
+        lowWidth = highWidth = ASPIRATION_WINDOW
+        while True:
+            alpha = max(previousScore - lowWidth, -CHECKMATE)
+            beta = min(previousScore + highWidth, CHECKMATE)
+            self.bestMove = None
+            score = self.negMaxMoveFindAlphaBeta(gs, validMoves, depth, alpha, beta, turn)
+            if self.searchStopped:
+                return score
+            if score <= alpha and alpha > -CHECKMATE:
+                lowWidth *= 2
+            elif score >= beta and beta < CHECKMATE:
+                highWidth *= 2
+            else:
+                return score
+            if self.stats is not None:
+                self.stats.aspirationResearches += 1
+
+    """
+    With verbose, prints the result of the search just finished: the stats summary if there are stats, otherwise the
+    best move, its score and the node count.
+    """
+    def reportSearch(self):
+        if self.verbose:
+            if self.stats is not None:
+                print("%s %s  %s" % (self.bestMove, self.bestScore, self.stats.summaryLine()))
+            else:
+                print("%s %s  depth %d  nodes %d" % (self.bestMove, self.bestScore, self.searchDepth, self.nodeCount))
+
+    """
+    Follows the best moves stored in the transposition table from the current position.
+    """
+    def getPrincipalVariation(self, gs, maxLength):
+        pv = []
+        moveRedo = gs.moveRedo
+        gs.moveRedo = [] #walking the variation must not disturb the player's redo stack
+        for i in range(maxLength):
+            entry = self.transpositionTable.probe(gs.zobristKey)
+            if entry is None or entry[3] is None:
+                break
+            move = None
+            for validMove in gs.getValidMoves():
+                if validMove.moveID == entry[3]:
+                    move = validMove
+                    break
+            if move is None:
+                break
+            gs.makeMove(move)
+            pv.append(move)
+        for i in range(len(pv)):
+            gs.undoMove()
+        gs.moveRedo = moveRedo
+        return pv
+
+    """
+    Sets searchStopped once the node limit is reached, the deadline has passed or stopEvent is set. The first iteration
+    is never stopped, so iterative deepening always has a move to return.
+    """
+    def checkSearchLimits(self):
+        if self.searchDepth > 1:
+            if (self.searchNodeLimit is not None and self.nodeCount >= self.searchNodeLimit) or \
+                    (self.searchDeadline is not None and time.perf_counter() >= self.searchDeadline) or \
+                    (self.stopEvent is not None and self.stopEvent.is_set()):
+                self.searchStopped = True
+
+    """
+    Alpha-beta negamax. validMoves is the list of moves at the root; every other node passes None and generates its
+    own moves.
+    """
+    def negMaxMoveFindAlphaBeta(self, gs, validMoves, depth, alpha, beta, turn):
+        self.nodeCount += 1
+        stats = self.stats
+        if stats is not None:
+            stats.nodesByPly[self.searchDepth - depth] += 1
+            if depth == 0:
+                stats.leavesByPly[self.searchDepth - depth] += 1
+        if self.nodeCount % LIMIT_CHECK_INTERVAL == 0:
+            self.checkSearchLimits()
+        if self.searchStopped:
+            return 0
+        #a repeated position or one past the fifty-move rule is a draw below the root; in check it could still be mate
+        if depth != self.searchDepth and (gs.isRepetition() or gs.halfmoveClock >= 100 and not gs.inCheck()):
+            return STALEMATE
+        if depth == 0:
+            return self.quiescenceSearch(gs, alpha, beta, turn, 0)
         else:
-            minScore = CHECKMATE
-            for move in validMoves:
+            #a position searched before, at least as deep, can be answered (or its window narrowed) from the table.
+            #the root is always searched so that bestMove gets set.
+            alphaOriginal = alpha
+            ply = self.searchDepth - depth
+            ttMoveID = None
+            entry = self.transpositionTable.probe(gs.zobristKey)
+            if entry is not None:
+                ttDepth, ttScore, ttFlag, ttMoveID = entry
+                if ttDepth >= depth and depth != self.searchDepth:
+                    if ttFlag == EXACT:
+                        return ttScore
+                    elif ttFlag == LOWER_BOUND:
+                        alpha = max(alpha, ttScore)
+                    elif ttFlag == UPPER_BOUND:
+                        beta = min(beta, ttScore)
+                    if beta <= alpha:
+                        return ttScore
+            #below the root the moves are generated stage by stage, so a cutoff skips generating the rest
+            if validMoves is None:
+                moves = gs.stagedMoves(self.moveOrderer, ply, ttMoveID)
+            else:
+                moves = self.moveOrderer.orderMoves(validMoves, ply, ttMoveID)
+            maxScore = -CHECKMATE
+            bestMoveID = None
+            movesSearched = 0
+            traceRoot = stats is not None and stats.trace and depth == self.searchDepth
+            for i, move in enumerate(moves):
+                movesSearched += 1
+                if traceRoot:
+                    moveStart = time.perf_counter()
                 gs.makeMove(move)
-                oppMoves = gs.getValidMoves()
-                score = minMaxMoveFind(gs, oppMoves, depth - 1, True)
-                if score < minScore:
-                    minScore = score
-                    if depth == MAX_DEPTH:
-                        nextMove = move
+                if i == 0:
+                    score = -self.negMaxMoveFindAlphaBeta(gs, None, depth - 1, -beta, -alpha, -turn)
+                else:
+                    #principal variation search: with the best move ordered first, the rest only have to be shown to
+                    #be no better than alpha, which a null window does cheaply; one that fails high is searched again
+                    score = -self.negMaxMoveFindAlphaBeta(gs, None, depth - 1, -alpha - NULL_WINDOW, -alpha, -turn)
+                    if alpha < score < beta and not self.searchStopped:
+                        if stats is not None:
+                            stats.researchesByPly[ply] += 1
+                        score = -self.negMaxMoveFindAlphaBeta(gs, None, depth - 1, -beta, -alpha, -turn)
+                if score > maxScore: # if a < b then -a > -b
+                    maxScore = score
+                    bestMoveID = move.moveID
+                    if depth == self.searchDepth:
+                        self.bestMove = move
                 gs.undoMove()
-            return minScore
+                if traceRoot:
+                    stats.traceRootMove(move, moveStart, score)
+                if self.searchStopped:
+                    return 0 #the score of an unfinished search must not reach the table
+                alpha = max(alpha, maxScore)
+                if beta <= alpha:
+                    self.moveOrderer.recordCutoff(move, ply, depth, i)
+                    if stats is not None:
+                        stats.cutoffsByPly[ply] += 1
+                        if i == 0:
+                            stats.firstMoveCutoffsByPly[ply] += 1
+                    break
+            if movesSearched == 0:
+                return -CHECKMATE if gs.inCheck() else STALEMATE
+            if maxScore <= alphaOriginal:
+                self.transpositionTable.store(gs.zobristKey, depth, maxScore, UPPER_BOUND, None)
+            elif maxScore >= beta:
+                self.transpositionTable.store(gs.zobristKey, depth, maxScore, LOWER_BOUND, bestMoveID)
+            else:
+                self.transpositionTable.store(gs.zobristKey, depth, maxScore, EXACT, bestMoveID)
+            return maxScore
 
-"""
-Nega Max
-"""
-def bestMoveNegaMax(gs, validMoves):
-    global nextMove
-    turn = 1 if gs.whiteToMove else -1
-    negMaxMoveFind(gs, validMoves, MAX_DEPTH, turn)
-    return nextMove
-
-def negMaxMoveFind(gs, validMoves, depth, turn):
-    global nextMove, counter 
-    counter += 1
-    if depth == 0:
-        return turn * board_score(gs)
-    else:
-        maxScore = -CHECKMATE
-        for move in validMoves:
+    """
+    Quiescence search: at the end of the main search, keep searching captures and promotions until the position is
+    quiet, so a leaf in the middle of an exchange is not scored as if the last capture ended it. The side to move may
+    also "stand pat" on the static score, since it is never forced to capture. When in check there is no standing pat:
+    every evasion is searched, and having none is checkmate.
+    """
+    def quiescenceSearch(self, gs, alpha, beta, turn, qDepth):
+        self.nodeCount += 1
+        if self.stats is not None:
+            self.stats.quiescenceNodesByPly[self.searchDepth + qDepth] += 1
+        if self.nodeCount % LIMIT_CHECK_INTERVAL == 0:
+            self.checkSearchLimits()
+        if self.searchStopped:
+            return 0
+        if gs.inCheck():
+            moves = gs.getValidMoves()
+            if len(moves) == 0:
+                return -CHECKMATE
+            standPat = maxScore = -CHECKMATE
+        else:
+            standPat = maxScore = turn * self.evaluate(gs)
+            if standPat >= beta or qDepth >= MAX_QUIESCENCE_DEPTH:
+                return standPat
+            if standPat + pieceScore['Q'] + DELTA_MARGIN < alpha:
+                return standPat #delta pruning: not even winning a queen would bring the score up to alpha
+            alpha = max(alpha, standPat)
+            moves = gs.getCaptureMoves()
+        for move in self.moveOrderer.orderMoves(moves, self.searchDepth + qDepth, None):
+            if standPat != -CHECKMATE and move.isPawnPromotion and move.promotionPiece != 'Q':
+                continue #an underpromotion is never the capture that changes the evaluation
+            if standPat != -CHECKMATE and not move.isPawnPromotion:
+                victim = pieceScore['p'] if move.isEnPassantMove else pieceScore[move.piececaptured[1]]
+                if standPat + victim + DELTA_MARGIN < alpha:
+                    continue #delta pruning: this capture cannot raise the score to alpha
             gs.makeMove(move)
-            oppMoves = gs.getValidMoves()
-            score = -negMaxMoveFind(gs, oppMoves, depth - 1, -turn)
-            if score > maxScore: # if a < b then -a > -b
-                maxScore = score
-                if depth == MAX_DEPTH:
-                    nextMove = move
+            score = -self.quiescenceSearch(gs, -beta, -alpha, -turn, qDepth + 1)
             gs.undoMove()
+            if self.searchStopped:
+                return 0
+            if score > maxScore:
+                maxScore = score
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
         return maxScore
 
-
 """
-Alpha Beta Pruning
+Moves the best move remembered in the transposition table to the front, so it is searched first.
 """
-def bestMoveNegaMaxAplhaBeta(gs, validMoves):
-    global nextMove, counter
-    turn = 1 if gs.whiteToMove else -1
-    random.shuffle(validMoves)
-    #negMaxMoveFind(gs, validMoves, MAX_DEPTH, turn)
-    negMaxMoveFindAlphaBeta(gs, validMoves, MAX_DEPTH, -CHECKMATE, CHECKMATE, turn)
-    return nextMove
-
-def negMaxMoveFindAlphaBeta(gs, validMoves, depth, alpha, beta, turn):
-    global nextMove, counter
-    if depth == 0:
-        return turn * board_score(gs)
-    else:
-        maxScore = -CHECKMATE
-        for move in validMoves:
-            gs.makeMove(move)
-            oppMoves = gs.getValidMoves()
-            score = -negMaxMoveFindAlphaBeta(gs, oppMoves, depth - 1, -beta, -alpha, -turn)
-            if score > maxScore: # if a < b then -a > -b
-                maxScore = score
-                if depth == MAX_DEPTH:
-                    nextMove = move
-                    print(nextMove, score)
-            gs.undoMove()
-            alpha = max(alpha, maxScore)
-            if beta <= alpha:
-                break
-        return maxScore
+def orderTTMoveFirst(moves, ttMoveID):
+    if ttMoveID is None:
+        return moves
+    for i in range(len(moves)):
+        if moves[i].moveID == ttMoveID:
+            return [moves[i]] + moves[:i] + moves[i + 1:]
+    return moves
 
 '''
 Computing the score of the board, applying a zero sum game.
 If white captures more pieces, we increase the score of the board by the pieceScore value, if black captures more, we decrease.
 '''
 def board_score(gs):
-    turn = 1 if gs.whiteToMove else -1
     if gs.checkMate:
         return -CHECKMATE if gs.whiteToMove else CHECKMATE 
     elif gs.staleMate:
         return STALEMATE
-    score = 0
-    for row in range(len(gs.board)):
-        for col in range(len(gs.board[row])):
-            piece = gs.board[row][col]
-            if piece != '--':
-                piecePositionScore = 0
-                if piece[1] != 'K': #no position table for king
-                    #scoring the board positionally and piece capture wise as well
-                    score += turn * (pieceScore[piece[1]] + piecePositionScores[piece][row][col] * .1) if piece[1] == 'p' else \
-                        turn * (pieceScore[piece[1]] + piecePositionScores[piece[1]][row][col] * .1)
-                    
-    return score
+    #GameState keeps the material and piece-square totals up to date as pieces move, so no board scan is needed
+    return gs.materialScore + gs.positionScore * .1
+
+"""
+Material only evaluation, e.g. as a weaker opponent in self-play.
+"""
+def materialScore(gs):
+    if gs.checkMate:
+        return -CHECKMATE if gs.whiteToMove else CHECKMATE
+    elif gs.staleMate:
+        return STALEMATE
+    return gs.materialScore
+
+
+#the searcher behind the module level functions, used by the GUI. It prints a line about every search it makes.
+defaultSearcher = Searcher(verbose=True)
+
+def setHashSize(sizeMB):
+    defaultSearcher.setHashSize(sizeMB)
+
+"""
+Gives the default searcher an OpeningBook to play from, or None to always search.
+"""
+def setOpeningBook(book):
+    defaultSearcher.book = book
+
+def stopSearch():
+    defaultSearcher.stop()
+
+def bestMoveMinMax(gs, validMoves):
+    return defaultSearcher.bestMoveMinMax(gs, validMoves, MAX_DEPTH)
+
+def bestMoveNegaMax(gs, validMoves):
+    return defaultSearcher.bestMoveNegaMax(gs, validMoves, MAX_DEPTH)
+
+def bestMoveNegaMaxAplhaBeta(gs, validMoves):
+    return defaultSearcher.bestMoveNegaMaxAplhaBeta(gs, validMoves, MAX_DEPTH)
+
+def bestMoveIterativeDeepening(gs, validMoves, timeLimitMs=None, nodeLimit=None, maxDepth=64):
+    return defaultSearcher.bestMoveIterativeDeepening(gs, validMoves, timeLimitMs, nodeLimit, maxDepth)
+
+def getPrincipalVariation(gs, maxLength):
+    return defaultSearcher.getPrincipalVariation(gs, maxLength)
 
 
 # #scoring the board positionally and piece capture wise as well
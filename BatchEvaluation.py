@@ -0,0 +1,116 @@
+"""
+Vectorized evaluation of many positions at once with NumPy, for offline datasets and for scoring a list of candidate
+moves. A position is encoded as 64 int8 piece codes (square row*8+col, 0 empty, 1-6 white pawn, knight, bishop, rook,
+queen, king, -1 to -6 the black ones), a batch as an (N, 64) array, and batchScores gives N scores in one pass.
+
+The scores are exactly AutomatedMoveFinder.board_score without its checkmate and stalemate cases: white minus black,
+pieceScore plus a tenth of the piecePositionScores entry, with whitePawnScores and blackPawnScores for the pawns.
+
+    python BatchEvaluation.py positions.fen         prints the score of every FEN in the file (or stdin), one per line
+
+The search keeps using GameState's running totals, which cost two attribute reads per position; encoding a position
+for NumPy costs far more than that, so batching only pays where there is no GameState to keep totals in.
+"""
+
+import sys
+import numpy as np
+from PieceScores import materialValues, positionValues
+
+BATCH_SIZE = 4096 #FENs read per batch by main
+pieceCodes = {"--": 0, "wp": 1, "wN": 2, "wB": 3, "wR": 4, "wQ": 5, "wK": 6,
+              "bp": -1, "bN": -2, "bB": -3, "bR": -4, "bQ": -5, "bK": -6}
+fenCodes = {"P": 1, "N": 2, "B": 3, "R": 4, "Q": 5, "K": 6, "p": -1, "n": -2, "b": -3, "r": -4, "q": -5, "k": -6}
+
+#(13, 64) tables indexed by piece code + 6 and square: whole pawns of material and tenths of a pawn of position, kept
+#as integers and summed before the one multiplication by .1, the same arithmetic as GameState's totals
+materialTable = np.zeros((13, 64), dtype=np.int32)
+positionTable = np.zeros((13, 64), dtype=np.int32)
+for piece, code in pieceCodes.items():
+    if code != 0:
+        materialTable[code + 6] = materialValues[piece]
+        positionTable[code + 6] = positionValues[piece]
+squareIndex = np.arange(64)
+
+def encodeBoard(board):
+    return np.array([pieceCodes[piece] for row in board for piece in row], dtype=np.int8)
+
+"""
+Encoding of the piece placement field of a FEN, without building a GameState.
+"""
+def encodeFen(fen):
+    codes = []
+    for char in fen.split()[0]:
+        if char.isdigit():
+            codes.extend([0] * int(char))
+        elif char != "/":
+            codes.append(fenCodes[char])
+    if len(codes) != 64:
+        raise ValueError("FEN placement does not describe 64 squares: " + fen)
+    return np.array(codes, dtype=np.int8)
+
+def encodePositions(gameStates):
+    return np.array([encodeBoard(gs.board) for gs in gameStates], dtype=np.int8).reshape(-1, 64)
+
+"""
+Scores of the (N, 64) int8 batch encoded: white minus black, in pawns, as a float64 array.
+"""
+def batchScores(encoded):
+    rows = encoded.astype(np.intp) + 6
+    material = materialTable[rows, squareIndex].sum(axis=1)
+    position = positionTable[rows, squareIndex].sum(axis=1)
+    return material + position * .1
+
+"""
+Encodings of the positions after each of moves (moves of gs), built from one encoding of gs by array updates rather
+than by making each move.
+"""
+def childPositions(gs, moves):
+    count = len(moves)
+    encoded = np.repeat(encodeBoard(gs.board)[np.newaxis], count, axis=0)
+    rows, squares, codes = [], [], []
+    for i, move in enumerate(moves):
+        piece = move.piecemoved[0] + move.promotionPiece if move.isPawnPromotion else move.piecemoved
+        rows += (i, i)
+        squares += (move.startrow * 8 + move.startcol, move.endrow * 8 + move.endcol)
+        codes += (0, pieceCodes[piece])
+        if move.isEnPassantMove: #the captured pawn is beside the start square, not on the end square
+            rows.append(i)
+            squares.append(move.startrow * 8 + move.endcol)
+            codes.append(0)
+        elif move.isCastleMove:
+            rookFrom, rookTo = (7, 5) if move.endcol > move.startcol else (0, 3)
+            rook = pieceCodes[move.piecemoved[0] + 'R']
+            rows += (i, i)
+            squares += (move.endrow * 8 + rookFrom, move.endrow * 8 + rookTo)
+            codes += (0, rook)
+    encoded[rows, squares] = codes #no move writes the same square twice
+    return encoded
+
+"""
+Score (white minus black) of the position after each of moves, in one batch: what board_score would give after
+making the move, apart from checkmate and stalemate.
+"""
+def scoreMoves(gs, moves):
+    if not moves:
+        return np.zeros(0)
+    return batchScores(childPositions(gs, moves))
+
+def main():
+    source = open(sys.argv[1]) if len(sys.argv) > 1 else sys.stdin
+    with source:
+        fens = []
+        for line in source:
+            if line.strip():
+                fens.append(line.strip())
+            if len(fens) == BATCH_SIZE:
+                printScores(fens)
+                fens = []
+        printScores(fens)
+
+def printScores(fens):
+    if fens:
+        for fen, score in zip(fens, batchScores(np.array([encodeFen(fen) for fen in fens], dtype=np.int8))):
+            print("%.1f %s" % (score, fen))
+
+if __name__ == "__main__":
+    main()
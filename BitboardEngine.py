@@ -0,0 +1,639 @@
+"""
+Bitboard backend for the chess engine. BitboardGameState is a drop-in replacement for ChessEngine.GameState: the
+move log and the Move objects stay the same, so AutomatedMoveFinder and ChessMain work with either class. The position
+lives in one 64-bit integer per piece type (a bit is set for every square holding that piece) plus occupancy masks:
+legal moves are generated from precomputed attack tables instead of walking the board square by square, and makeMove
+and undoMove work on the bitboards directly. The 8x8 board of strings is kept only as a mirror, written once per
+square that changes, because Move objects and the GUI read pieces from it.
+
+Measured against the mailbox GameState on one core: about twice the nodes per second in perft and in the alpha-beta
+search. Most of what is left is the cost of building Move objects and of the search itself rather than of finding the
+moves, so no representation change alone gets this to an order of magnitude while the search works with Move objects.
+
+Squares are numbered the same way as the board is stored: square = row * 8 + col, so a8 is 0 and h1 is 63.
+"""
+
+import ChessEngine
+from ChessEngine import zobristPieceKeys, zobristBlackToMoveKey, zobristCastlingTable, zobristEnpassantKeys
+from PieceScores import materialValues, positionValues
+
+ALL_SQUARES = (1 << 64) - 1
+#which moves generateLegalMoves produces. Captures include en passant and every promotion, so the two halves split
+#the legal moves with no move in both
+ALL_MOVES, CAPTURE_MOVES, QUIET_MOVES = range(3)
+PIECES = ["wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK"]
+squareCoords = [(sq // 8, sq % 8) for sq in range(64)]
+
+def onBoard(r, c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+def leapAttacks(offsets):
+    table = []
+    for sq in range(64):
+        r, c = squareCoords[sq]
+        mask = 0
+        for dr, dc in offsets:
+            if onBoard(r + dr, c + dc):
+                mask |= 1 << ((r + dr) * 8 + c + dc)
+        table.append(mask)
+    return table
+
+knightAttacks = leapAttacks([(-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, 2), (1, -2)])
+kingAttacks = leapAttacks([(-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)])
+#squares a pawn of the given color attacks from each square (white pawns move towards row 0)
+pawnAttacks = {'w': leapAttacks([(-1, -1), (-1, 1)]), 'b': leapAttacks([(1, -1), (1, 1)])}
+
+#sliding directions; positive ones walk towards higher square numbers, so the nearest blocker is the lowest set bit
+NORTH, SOUTH, WEST, EAST, NORTH_WEST, NORTH_EAST, SOUTH_WEST, SOUTH_EAST = range(8)
+directions = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+positiveDirection = [False, True, False, True, False, False, True, True]
+oppositeDirection = [SOUTH, NORTH, EAST, WEST, SOUTH_EAST, SOUTH_WEST, NORTH_EAST, NORTH_WEST]
+rookDirections = (NORTH, SOUTH, WEST, EAST)
+bishopDirections = (NORTH_WEST, NORTH_EAST, SOUTH_WEST, SOUTH_EAST)
+
+#rays[d][sq] holds every square reachable from sq in direction d on an empty board
+rays = []
+for dr, dc in directions:
+    table = []
+    for sq in range(64):
+        r, c = squareCoords[sq]
+        mask = 0
+        i = 1
+        while onBoard(r + dr * i, c + dc * i):
+            mask |= 1 << ((r + dr * i) * 8 + c + dc * i)
+            i += 1
+        table.append(mask)
+    rays.append(table)
+
+#between[a][b] holds the squares strictly between a and b when they share a line, else 0
+#line[a][b] holds the whole line through a and b (used to keep pinned pieces on their pin ray)
+between = [[0] * 64 for sq in range(64)]
+line = [[0] * 64 for sq in range(64)]
+for a in range(64):
+    for d in range(8):
+        opposite = oppositeDirection[d]
+        ray = rays[d][a]
+        while ray:
+            b = (ray & -ray).bit_length() - 1
+            ray &= ray - 1
+            between[a][b] = rays[d][a] & rays[opposite][b]
+            line[a][b] = rays[d][a] | rays[opposite][a] | (1 << a)
+
+#castling rights (as CastlingRights.toBits()) that survive a move from or to each square: moving a king or rook, or
+#capturing a rook, on its home square loses the rights that need it
+castlingKeep = [15] * 64
+castlingKeep[63], castlingKeep[56], castlingKeep[60] = 15 & ~1, 15 & ~2, 15 & ~3
+castlingKeep[7], castlingKeep[0], castlingKeep[4] = 15 & ~4, 15 & ~8, 15 & ~12
+
+def lowestSquare(bb):
+    return (bb & -bb).bit_length() - 1
+
+def slidingAttacks(sq, occupied, dirs):
+    attacks = 0
+    for d in dirs:
+        ray = rays[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            blocker = (blockers & -blockers).bit_length() - 1 if positiveDirection[d] else blockers.bit_length() - 1
+            ray ^= rays[d][blocker]
+        attacks |= ray
+    return attacks
+
+"""
+Attack tables for one line through every square (a rank, a file or a diagonal, given as its two directions). A slider's
+attacks along a line depend only on which squares of that line are occupied, and not even on the two end squares,
+since the attack reaches an end square whether or not something stands on it. So lineMasks[sq] holds the squares of the
+line through sq that matter, and lineAttacks[sq] maps every subset of them (occupied & lineMasks[sq]) to the attacks.
+That is at most 64 entries per square and line, and a lookup replaces walking the rays.
+"""
+def lineAttackTables(lineDirections):
+    lineMasks, lineAttacks = [], []
+    for sq in range(64):
+        mask = 0
+        for d in lineDirections:
+            ray = rays[d][sq]
+            if ray:
+                edge = lowestSquare(ray) if not positiveDirection[d] else ray.bit_length() - 1
+                mask |= ray & ~(1 << edge)
+        table = {}
+        subset = 0
+        while True: #every subset of mask, by the carry-rippler trick
+            table[subset] = slidingAttacks(sq, subset, lineDirections)
+            subset = (subset - mask) & mask
+            if subset == 0:
+                break
+        lineMasks.append(mask)
+        lineAttacks.append(table)
+    return lineMasks, lineAttacks
+
+rankMasks, rankAttacks = lineAttackTables((WEST, EAST))
+fileMasks, fileAttacks = lineAttackTables((NORTH, SOUTH))
+diagonalMasks, diagonalAttacks = lineAttackTables((NORTH_WEST, SOUTH_EAST))
+antiDiagonalMasks, antiDiagonalAttacks = lineAttackTables((NORTH_EAST, SOUTH_WEST))
+
+def rookAttacks(sq, occupied):
+    return rankAttacks[sq][occupied & rankMasks[sq]] | fileAttacks[sq][occupied & fileMasks[sq]]
+
+def bishopAttacks(sq, occupied):
+    return diagonalAttacks[sq][occupied & diagonalMasks[sq]] | antiDiagonalAttacks[sq][occupied & antiDiagonalMasks[sq]]
+
+
+class BitboardGameState(ChessEngine.GameState):
+    def __init__(self):
+        super().__init__()
+        self.loadBitboards()
+
+    """
+    Rebuilds every bitboard from self.board. Needed whenever the board is set up without going through setSquare.
+    """
+    def loadBitboards(self):
+        self.bitboards = {piece: 0 for piece in PIECES}
+        self.occupancy = {'w': 0, 'b': 0}
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != '--':
+                    self.bitboards[piece] |= 1 << (r * 8 + c)
+                    self.occupancy[piece[0]] |= 1 << (r * 8 + c)
+
+    def refreshDerivedState(self):
+        self.loadBitboards()
+        super().refreshDerivedState()
+
+    def setSquare(self, r, c, piece):
+        oldPiece = self.board[r][c]
+        if oldPiece != piece:
+            bit = 1 << (r * 8 + c)
+            if oldPiece != '--':
+                self.bitboards[oldPiece] ^= bit
+                self.occupancy[oldPiece[0]] ^= bit
+            if piece != '--':
+                self.bitboards[piece] ^= bit
+                self.occupancy[piece[0]] ^= bit
+            super().setSquare(r, c, piece)
+
+    """
+    Same as GameState.makeMove, but worked out on the bitboards: each piece that moves, is captured or promotes is
+    XORed out of and into its bitboard once, with the Zobrist key and evaluation totals updated alongside, instead of
+    going through setSquare square by square. The board of strings is kept as a plain mirror (one list store per
+    square that changes) since Move objects read the pieces from it.
+    """
+    def makeMove(self, move, isRedo=False):
+        board = self.board
+        piece = move.piecemoved
+        if board[move.startrow][move.startcol] == '--':
+            return
+        enpassant = self.enpassantPossible
+        castlingRight = self.currentCastlingRight
+        rights = castlingRight.toBits()
+        self.stateLog.append(self.zobristKey << ChessEngine.STATE_KEY_SHIFT |
+                             self.halfmoveClock << ChessEngine.STATE_CLOCK_SHIFT |
+                             (enpassant[0] * 8 + enpassant[1] + 1 if enpassant else 0) << ChessEngine.STATE_ENPASSANT_SHIFT |
+                             rights)
+        if not isRedo:
+            self.moveRedo.clear()
+        bb = self.bitboards
+        occupancy = self.occupancy
+        color = piece[0]
+        fromSq = move.startrow * 8 + move.startcol
+        toSq = move.endrow * 8 + move.endcol
+        key = self.zobristKey ^ zobristCastlingTable[rights] ^ zobristBlackToMoveKey
+        enemyColor = 'b' if color == 'w' else 'w'
+        #the en passant file is in the key only if one of our pawns could take, see GameState.zobristStateKey
+        if enpassant and bb[color + 'p'] & pawnAttacks[enemyColor][enpassant[0] * 8 + enpassant[1]]:
+            key ^= zobristEnpassantKeys[enpassant[1]]
+        material = self.materialScore
+        position = self.positionScore
+
+        if move.isEnPassantMove:
+            captureSq = move.startrow * 8 + move.endcol
+            move.piececaptured = board[move.startrow][move.endcol] #undoMove puts the pawn back from here
+        else:
+            captureSq = toSq
+        captured = move.piececaptured
+        if captured != '--':
+            bit = 1 << captureSq
+            bb[captured] ^= bit
+            occupancy[captured[0]] ^= bit
+            key ^= zobristPieceKeys[captured][captureSq]
+            material -= materialValues[captured]
+            position -= positionValues[captured][captureSq]
+            board[captureSq >> 3][captureSq & 7] = '--'
+
+        placed = color + move.promotionPiece if move.isPawnPromotion else piece
+        bb[piece] ^= 1 << fromSq
+        bb[placed] ^= 1 << toSq
+        occupancy[color] ^= (1 << fromSq) | (1 << toSq)
+        key ^= zobristPieceKeys[piece][fromSq] ^ zobristPieceKeys[placed][toSq]
+        if placed != piece:
+            material += materialValues[placed] - materialValues[piece]
+        position += positionValues[placed][toSq] - positionValues[piece][fromSq]
+        board[move.startrow][move.startcol] = '--'
+        board[move.endrow][move.endcol] = placed
+
+        if move.isCastleMove:
+            rookFrom, rookTo = (toSq + 1, toSq - 1) if move.endcol > move.startcol else (toSq - 2, toSq + 1)
+            self.moveRook(color + 'R', rookFrom, rookTo)
+            key ^= zobristPieceKeys[color + 'R'][rookFrom] ^ zobristPieceKeys[color + 'R'][rookTo]
+            position += positionValues[color + 'R'][rookTo] - positionValues[color + 'R'][rookFrom]
+
+        if piece[1] == 'K':
+            if color == 'w':
+                self.whiteKingLocation = (move.endrow, move.endcol)
+            else:
+                self.blackKingLocation = (move.endrow, move.endcol)
+        self.moveLog.append(move)
+        self.whiteToMove = not self.whiteToMove
+        if piece[1] == 'p' and abs(toSq - fromSq) == 16:
+            self.enpassantPossible = ChessEngine.enpassantSquares[(fromSq + toSq) // 2 + 1]
+            if bb[enemyColor + 'p'] & pawnAttacks[color][(fromSq + toSq) // 2]:
+                key ^= zobristEnpassantKeys[move.startcol]
+        else:
+            self.enpassantPossible = ()
+        self.halfmoveClock = 0 if piece[1] == 'p' or captured != '--' else self.halfmoveClock + 1
+        if color == 'b':
+            self.fullmoveNumber += 1
+        if rights: #with no rights left there are none to lose
+            newRights = rights & castlingKeep[fromSq] & castlingKeep[toSq]
+            if newRights != rights:
+                castlingRight.setBits(newRights)
+            key ^= zobristCastlingTable[newRights]
+        self.zobristKey = key
+        self.materialScore = material
+        self.positionScore = position
+        if ChessEngine.DEBUG_ZOBRIST:
+            self.checkZobristKey()
+        if ChessEngine.DEBUG_EVALUATION:
+            self.checkEvaluationTotals()
+
+    """
+    Takes back the last move, the reverse of makeMove. The key, clock, castling rights and en passant square come back
+    from stateLog; the evaluation totals are worked back from the move.
+    """
+    def undoMove(self):
+        if not self.moveLog:
+            return
+        move = self.moveLog.pop()
+        state = self.stateLog.pop()
+        board = self.board
+        bb = self.bitboards
+        occupancy = self.occupancy
+        piece = move.piecemoved
+        color = piece[0]
+        fromSq = move.startrow * 8 + move.startcol
+        toSq = move.endrow * 8 + move.endcol
+        material = self.materialScore
+        position = self.positionScore
+
+        placed = color + move.promotionPiece if move.isPawnPromotion else piece
+        bb[placed] ^= 1 << toSq
+        bb[piece] ^= 1 << fromSq
+        occupancy[color] ^= (1 << fromSq) | (1 << toSq)
+        if placed != piece:
+            material -= materialValues[placed] - materialValues[piece]
+        position -= positionValues[placed][toSq] - positionValues[piece][fromSq]
+        board[move.endrow][move.endcol] = '--'
+        board[move.startrow][move.startcol] = piece
+
+        captured = move.piececaptured
+        if captured != '--':
+            captureSq = move.startrow * 8 + move.endcol if move.isEnPassantMove else toSq
+            bit = 1 << captureSq
+            bb[captured] ^= bit
+            occupancy[captured[0]] ^= bit
+            material += materialValues[captured]
+            position += positionValues[captured][captureSq]
+            board[captureSq >> 3][captureSq & 7] = captured
+
+        if move.isCastleMove:
+            rookFrom, rookTo = (toSq + 1, toSq - 1) if move.endcol > move.startcol else (toSq - 2, toSq + 1)
+            self.moveRook(color + 'R', rookTo, rookFrom)
+            position -= positionValues[color + 'R'][rookTo] - positionValues[color + 'R'][rookFrom]
+
+        if piece[1] == 'K':
+            if color == 'w':
+                self.whiteKingLocation = (move.startrow, move.startcol)
+            else:
+                self.blackKingLocation = (move.startrow, move.startcol)
+        self.whiteToMove = not self.whiteToMove
+        if color == 'b':
+            self.fullmoveNumber -= 1
+        self.enpassantPossible = ChessEngine.enpassantSquares[state >> ChessEngine.STATE_ENPASSANT_SHIFT & 127]
+        self.halfmoveClock = state >> ChessEngine.STATE_CLOCK_SHIFT & 0xFFFF
+        self.currentCastlingRight.setBits(state & 15)
+        self.zobristKey = state >> ChessEngine.STATE_KEY_SHIFT
+        self.materialScore = material
+        self.positionScore = position
+        if ChessEngine.DEBUG_ZOBRIST:
+            self.checkZobristKey()
+        if ChessEngine.DEBUG_EVALUATION:
+            self.checkEvaluationTotals()
+        self.moveRedo.append(move)
+        self.checkMate = False
+        self.staleMate = False
+
+    def moveRook(self, rook, fromSq, toSq):
+        bits = (1 << fromSq) | (1 << toSq)
+        self.bitboards[rook] ^= bits
+        self.occupancy[rook[0]] ^= bits
+        self.board[fromSq >> 3][fromSq & 7] = '--'
+        self.board[toSq >> 3][toSq & 7] = rook
+
+    """
+    Returns a bitboard of all pieces of color byColor that attack sq, for the given occupancy.
+    """
+    def attackersOf(self, sq, byColor, occupied):
+        bb = self.bitboards
+        queens = bb[byColor + 'Q']
+        enemyColor = 'b' if byColor == 'w' else 'w'
+        return (knightAttacks[sq] & bb[byColor + 'N']) | (kingAttacks[sq] & bb[byColor + 'K']) | \
+            (pawnAttacks[enemyColor][sq] & bb[byColor + 'p']) | \
+            (rookAttacks(sq, occupied) & (bb[byColor + 'R'] | queens)) | \
+            (bishopAttacks(sq, occupied) & (bb[byColor + 'B'] | queens))
+
+    def isSquareAttacked(self, sq, byColor):
+        return self.attackersOf(sq, byColor, self.occupancy['w'] | self.occupancy['b']) != 0
+
+    def inCheck(self):
+        allyColor = 'w' if self.whiteToMove else 'b'
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        return self.isSquareAttacked(lowestSquare(self.bitboards[allyColor + 'K']), enemyColor)
+
+    def getValidMoves(self):
+        moves = self.generateLegalMoves(ALL_MOVES)
+        if self.moveLog:
+            self.moveLog[-1].isCheckMove = self.isCheck #for the move log display; makeMove does not look for checks
+        if len(moves) == 0: #checking for checkmate and stalemate condition.
+            if self.isCheck:
+                self.checkMate = True
+            else:
+                self.staleMate = True
+        return moves
+
+    """
+    True if the side to move has a legal move, setting the same flags as getValidMoves. The pieces are asked one at a
+    time, king first, so the generator stops at the first piece that can move instead of producing every move.
+    """
+    def hasLegalMove(self):
+        checkInfo = self.checkAndPinInfo()
+        if self.moveLog:
+            self.moveLog[-1].isCheckMove = self.isCheck
+        allyColor = 'w' if self.whiteToMove else 'b'
+        king = self.bitboards[allyColor + 'K']
+        pieces = self.occupancy[allyColor] ^ king
+        if self.generateLegalMoves(ALL_MOVES, king, checkInfo):
+            return True
+        while pieces:
+            piece = pieces & -pieces
+            pieces ^= piece
+            if self.generateLegalMoves(ALL_MOVES, piece, checkInfo):
+                return True
+        if self.isCheck:
+            self.checkMate = True
+        else:
+            self.staleMate = True
+        return False
+
+    """
+    Returns True if move (one of the valid moves) would put the opponent in check, without making it: either the piece
+    attacks the enemy king from its new square (as the promoted piece, or as the rook after castling), or leaving its
+    square (or the pawn taken en passant leaving its square) uncovers one of our sliders.
+    """
+    def givesCheck(self, move):
+        bb = self.bitboards
+        allyColor = move.piecemoved[0]
+        enemyKingSq = lowestSquare(bb[('b' if allyColor == 'w' else 'w') + 'K'])
+        fromSq = move.startrow * 8 + move.startcol
+        toSq = move.endrow * 8 + move.endcol
+        occupied = (self.occupancy['w'] | self.occupancy['b']) & ~(1 << fromSq) | (1 << toSq)
+        moved = 1 << fromSq
+        if move.isEnPassantMove:
+            occupied &= ~(1 << (move.startrow * 8 + move.endcol))
+        if move.isCastleMove:
+            rookFrom, rookTo = (toSq + 1, toSq - 1) if move.endcol > move.startcol else (toSq - 2, toSq + 1)
+            occupied = occupied & ~(1 << rookFrom) | (1 << rookTo)
+            moved |= 1 << rookFrom
+            if rookAttacks(rookTo, occupied) & (1 << enemyKingSq):
+                return True
+        else:
+            pieceType = move.promotionPiece if move.isPawnPromotion else move.piecemoved[1]
+            if pieceType == 'p':
+                attacks = pawnAttacks[allyColor][toSq]
+            elif pieceType == 'N':
+                attacks = knightAttacks[toSq]
+            elif pieceType == 'B':
+                attacks = bishopAttacks(toSq, occupied)
+            elif pieceType == 'R':
+                attacks = rookAttacks(toSq, occupied)
+            elif pieceType == 'Q':
+                attacks = rookAttacks(toSq, occupied) | bishopAttacks(toSq, occupied)
+            else:
+                attacks = 0 #a king never gives check itself
+            if attacks & (1 << enemyKingSq):
+                return True
+        rooks = (bb[allyColor + 'R'] | bb[allyColor + 'Q']) & ~moved
+        bishops = (bb[allyColor + 'B'] | bb[allyColor + 'Q']) & ~moved
+        return (rookAttacks(enemyKingSq, occupied) & rooks) != 0 or (bishopAttacks(enemyKingSq, occupied) & bishops) != 0
+
+    """
+    Legal captures (including en passant) and promotions only, for the quiescence search. An empty list says nothing
+    about checkmate or stalemate, so the flags are left alone.
+    """
+    def getCaptureMoves(self):
+        return self.generateLegalMoves(CAPTURE_MOVES)
+
+    """
+    Legal moves that are neither captures nor promotions, castling included.
+    """
+    def getQuietMoves(self):
+        return self.generateLegalMoves(QUIET_MOVES)
+
+    """
+    Staged move generation for the search, in the order the MoveOrderer would sort them: the transposition table move
+    (generated alone, from its piece's square), then captures and promotions best first, then killers and the other
+    quiet moves by history. A cutoff on an early move means the later stages are never generated at all.
+    """
+    def stagedMoves(self, orderer, ply, ttMoveID=None):
+        checkInfo = self.checkAndPinInfo()
+        ttMove = None
+        if ttMoveID is not None:
+            fromSq = ttMoveID // 1000 % 10 * 8 + ttMoveID // 100 % 10
+            for move in self.generateLegalMoves(ALL_MOVES, 1 << fromSq, checkInfo):
+                if move.moveID == ttMoveID:
+                    ttMove = move
+                    break
+            if ttMove is not None:
+                yield ttMove
+        for move in orderer.orderMoves(self.generateLegalMoves(CAPTURE_MOVES, ALL_SQUARES, checkInfo), ply):
+            if ttMove is None or move.moveID != ttMoveID:
+                yield move
+        for move in orderer.orderMoves(self.generateLegalMoves(QUIET_MOVES, ALL_SQUARES, checkInfo), ply):
+            if ttMove is None or move.moveID != ttMoveID:
+                yield move
+
+    """
+    Legal move generation: find the checking pieces and the pinned pieces from the king's square once, then restrict
+    every piece's attack set to the squares that resolve the check and keep pinned pieces on their pin line.
+    kind is ALL_MOVES, CAPTURE_MOVES (enemy pieces, en passant and pawn pushes that promote) or QUIET_MOVES (the
+    rest). Only pieces standing on a square in fromMask are moved. checkInfo is what checkAndPinInfo() returned for
+    this position, so that generating several stages of one position finds the checks and pins only once.
+    """
+    def generateLegalMoves(self, kind=ALL_MOVES, fromMask=ALL_SQUARES, checkInfo=None):
+        moves = []
+        bb = self.bitboards
+        board = self.board
+        allyColor = 'w' if self.whiteToMove else 'b'
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        own = self.occupancy[allyColor]
+        enemy = self.occupancy[enemyColor]
+        occupied = own | enemy
+        king = allyColor + 'K'
+        kingSq = lowestSquare(bb[king])
+        newMove = ChessEngine.Move.plain
+
+        checkers, checkMask, pinned = checkInfo if checkInfo is not None else self.checkAndPinInfo()
+        kindMask = enemy if kind == CAPTURE_MOVES else ~occupied if kind == QUIET_MOVES else ~own
+
+        #king moves: the king itself must not shadow the square behind it from a slider
+        withoutKing = occupied ^ (1 << kingSq)
+        targets = kingAttacks[kingSq] & kindMask if fromMask & (1 << kingSq) else 0
+        while targets:
+            to = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            if not self.attackersOf(to, enemyColor, withoutKing):
+                moves.append(newMove(kingSq, to, king, board[to >> 3][to & 7]))
+
+        if checkers & (checkers - 1) == 0: #not in double check, so other pieces may move
+            targetMask = kindMask & checkMask
+            for piece, attackFunction in ((allyColor + 'N', None), (allyColor + 'B', bishopAttacks),
+                                          (allyColor + 'R', rookAttacks), (allyColor + 'Q', None)):
+                pieces = bb[piece] & fromMask
+                while pieces:
+                    sq = (pieces & -pieces).bit_length() - 1
+                    pieces &= pieces - 1
+                    if attackFunction is not None:
+                        targets = attackFunction(sq, occupied)
+                    elif piece[1] == 'N':
+                        targets = knightAttacks[sq]
+                    else:
+                        targets = rookAttacks(sq, occupied) | bishopAttacks(sq, occupied)
+                    targets &= targetMask
+                    if sq in pinned:
+                        targets &= pinned[sq]
+                    while targets:
+                        to = (targets & -targets).bit_length() - 1
+                        targets &= targets - 1
+                        moves.append(newMove(sq, to, piece, board[to >> 3][to & 7]))
+
+            self.getPawnMovesBitboard(moves, allyColor, enemyColor, occupied, enemy, kingSq, checkMask, pinned, kind,
+                                      fromMask)
+            if not checkers and kind != CAPTURE_MOVES and fromMask & (1 << kingSq):
+                self.getCastleMovesBitboard(moves, allyColor, enemyColor, occupied, kingSq)
+        return moves
+
+    """
+    (checkers, checkMask, pinned) for the side to move: the enemy pieces giving check, the squares that resolve a
+    single check (every square when not in check), and a dict from each pinned piece's square to the line it must stay
+    on. Also sets self.isCheck.
+    """
+    def checkAndPinInfo(self):
+        bb = self.bitboards
+        allyColor = 'w' if self.whiteToMove else 'b'
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        own = self.occupancy[allyColor]
+        enemy = self.occupancy[enemyColor]
+        occupied = own | enemy
+        kingSq = lowestSquare(bb[allyColor + 'K'])
+        checkers = self.attackersOf(kingSq, enemyColor, occupied)
+        self.isCheck = checkers != 0
+        if checkers:
+            checkMask = checkers | between[kingSq][lowestSquare(checkers)] if checkers & (checkers - 1) == 0 else 0
+        else:
+            checkMask = ALL_SQUARES
+        pinned = {}
+        enemyRooks = bb[enemyColor + 'R'] | bb[enemyColor + 'Q']
+        enemyBishops = bb[enemyColor + 'B'] | bb[enemyColor + 'Q']
+        snipers = (rookAttacks(kingSq, enemy) & enemyRooks) | (bishopAttacks(kingSq, enemy) & enemyBishops)
+        while snipers:
+            sniperSq = (snipers & -snipers).bit_length() - 1
+            snipers &= snipers - 1
+            blockers = between[kingSq][sniperSq] & occupied
+            if blockers and blockers & (blockers - 1) == 0 and blockers & own:
+                pinned[lowestSquare(blockers)] = line[kingSq][sniperSq]
+        return checkers, checkMask, pinned
+
+    def getPawnMovesBitboard(self, moves, allyColor, enemyColor, occupied, enemy, kingSq, checkMask, pinned, kind, fromMask):
+        board = self.board
+        newMove = ChessEngine.Move.plain
+        pawn = allyColor + 'p'
+        forward, startRow, backRow = (-8, 6, 0) if allyColor == 'w' else (8, 1, 7)
+        epSq = self.enpassantPossible[0] * 8 + self.enpassantPossible[1] if self.enpassantPossible != () else -1
+        pawns = self.bitboards[pawn] & fromMask
+        while pawns:
+            sq = (pawns & -pawns).bit_length() - 1
+            pawns &= pawns - 1
+            allowed = checkMask & pinned.get(sq, ALL_SQUARES)
+            one = sq + forward
+            if not occupied & (1 << one):
+                promotion = one >> 3 == backRow
+                if allowed & (1 << one) and (kind == ALL_MOVES or (kind == CAPTURE_MOVES) == promotion):
+                    if promotion:
+                        self.addPawnMoves(moves, squareCoords[sq], squareCoords[one], True)
+                    else:
+                        moves.append(newMove(sq, one, pawn, '--'))
+                two = one + forward
+                if kind != CAPTURE_MOVES and sq >> 3 == startRow and not occupied & (1 << two) and allowed & (1 << two):
+                    moves.append(newMove(sq, two, pawn, '--'))
+            if kind == QUIET_MOVES:
+                continue
+            targets = pawnAttacks[allyColor][sq] & enemy & allowed
+            while targets:
+                to = (targets & -targets).bit_length() - 1
+                targets &= targets - 1
+                if to >> 3 == backRow:
+                    self.addPawnMoves(moves, squareCoords[sq], squareCoords[to], True)
+                else:
+                    moves.append(newMove(sq, to, pawn, board[to >> 3][to & 7]))
+            if epSq >= 0 and pawnAttacks[allyColor][sq] & (1 << epSq) and \
+                    self.enPassantIsLegal(sq, epSq, epSq - forward, enemyColor, occupied, kingSq):
+                moves.append(ChessEngine.Move(squareCoords[sq], squareCoords[epSq], board, isEnPassantMove=True))
+
+    """
+    True if the pawn on sq may take the pawn on capturedSq en passant, landing on epSq. The capture is played on the
+    occupancy and the king looked at directly; this covers pins, checks and the case where both pawns leave the king's
+    rank together.
+    """
+    def enPassantIsLegal(self, sq, epSq, capturedSq, enemyColor, occupied, kingSq):
+        afterOccupied = (occupied ^ (1 << sq) ^ (1 << capturedSq)) | (1 << epSq)
+        enemyPawns = self.bitboards[enemyColor + 'p']
+        self.bitboards[enemyColor + 'p'] = enemyPawns ^ (1 << capturedSq)
+        exposed = self.attackersOf(kingSq, enemyColor, afterOccupied)
+        self.bitboards[enemyColor + 'p'] = enemyPawns
+        return not exposed
+
+    def getCastleMovesBitboard(self, moves, allyColor, enemyColor, occupied, kingSq):
+        kingPos = squareCoords[kingSq]
+        for to in self.castleTargets(allyColor, enemyColor, occupied, kingSq):
+            moves.append(ChessEngine.Move(kingPos, squareCoords[to], self.board, isCastleMove=True))
+
+    """
+    The squares the king on kingSq may castle to, for a side not in check: the right is held, the squares between king
+    and rook are empty and the two the king crosses are not attacked.
+    """
+    def castleTargets(self, allyColor, enemyColor, occupied, kingSq):
+        if allyColor == 'w':
+            kingSide, queenSide = self.currentCastlingRight.wks, self.currentCastlingRight.wqs
+        else:
+            kingSide, queenSide = self.currentCastlingRight.bks, self.currentCastlingRight.bqs
+        targets = []
+        if kingSide and not occupied & ((1 << (kingSq + 1)) | (1 << (kingSq + 2))):
+            if not self.attackersOf(kingSq + 1, enemyColor, occupied) and not self.attackersOf(kingSq + 2, enemyColor, occupied):
+                targets.append(kingSq + 2)
+        if queenSide and not occupied & ((1 << (kingSq - 1)) | (1 << (kingSq - 2)) | (1 << (kingSq - 3))):
+            if not self.attackersOf(kingSq - 1, enemyColor, occupied) and not self.attackersOf(kingSq - 2, enemyColor, occupied):
+                targets.append(kingSq - 2)
+        return targets
+
+
+#the GameState classes by the name the command line tools take them by; both play the same games with the same keys
+backends = {"mailbox": ChessEngine.GameState, "bitboard": BitboardGameState}
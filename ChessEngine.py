@@ -3,10 +3,60 @@ This class is responsible for storing all information about the current state of
 maintain a log of all allowed moves. This log will allow us to undo moves, back to a previous state. 
 """
 
-from importlib.metadata import files
-import copy
+import random
+from PieceScores import materialValues, positionValues
 
-from numpy import block
+"""
+Zobrist hashing: every (piece, square) pair, the side to move, each castling right and each en passant file gets a
+random 64-bit number. The key of a position is the XOR of the numbers for everything present in it, so a move only
+has to XOR out what changed and XOR in the new state. The generator is seeded so keys are the same in every process.
+"""
+zobristRandom = random.Random(20220101)
+zobristPieceKeys = {color + piece: [zobristRandom.getrandbits(64) for sq in range(64)] for color in "wb" for piece in "pNBRQK"}
+zobristBlackToMoveKey = zobristRandom.getrandbits(64)
+zobristCastlingKeys = {right: zobristRandom.getrandbits(64) for right in ("wks", "wqs", "bks", "bqs")}
+zobristEnpassantKeys = [zobristRandom.getrandbits(64) for col in range(8)]
+#combined key of every set of castling rights, indexed by CastlingRights.toBits()
+zobristCastlingTable = [(zobristCastlingKeys["wks"] if bits & 1 else 0) ^ (zobristCastlingKeys["wqs"] if bits & 2 else 0) ^
+                        (zobristCastlingKeys["bks"] if bits & 4 else 0) ^ (zobristCastlingKeys["bqs"] if bits & 8 else 0)
+                        for bits in range(16)]
+DEBUG_ZOBRIST = False #when True, every makeMove/undoMove recomputes the key from scratch and compares
+DEBUG_EVALUATION = False #when True, every makeMove/undoMove rescans the board to check the evaluation totals
+
+#FEN letters: upper case for white, lower case for black; our pawns are "wp"/"bp" rather than "wP"/"bP"
+fenToPiece = {"P": "wp", "N": "wN", "B": "wB", "R": "wR", "Q": "wQ", "K": "wK",
+              "p": "bp", "n": "bN", "b": "bB", "r": "bR", "q": "bQ", "k": "bK"}
+pieceToFen = {v: k for k, v in fenToPiece.items()}
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+"""
+What makeMove cannot recover from the move itself is pushed onto GameState.stateLog as one int per ply, and undoMove
+pops it back: bits 0-3 castling rights, bits 4-10 en passant square (0 for none, else row*8+col+1), bits 11-26 halfmove
+clock, and from bit 27 up the Zobrist key. No objects are allocated or copied per move.
+"""
+STATE_ENPASSANT_SHIFT = 4
+STATE_CLOCK_SHIFT = 11
+STATE_KEY_SHIFT = 27
+enpassantSquares = [()] + [(sq // 8, sq % 8) for sq in range(64)] #en passant tuple by its code in the state record
+
+"""
+Move tables for the mailbox generator, built once and indexed by square (row*8+col, as for the Zobrist keys), so the
+generators never recompute offsets or test board bounds. rayTargets[sq][j] are the squares along rayDirections[j]
+from sq, nearest first; directions 0-3 are orthogonal and 4-7 diagonal. pawnAttackers[color][sq] are the squares
+from which a pawn of that color attacks sq.
+"""
+rayDirections = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, 1), (1, -1)]
+knightDirections = [(-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, 2), (1, -2)]
+
+def targetSquares(sq, offsets):
+    r, c = sq // 8, sq % 8
+    return [(r + dr, c + dc) for dr, dc in offsets if 0 <= r + dr < 8 and 0 <= c + dc < 8]
+
+knightTargets = [targetSquares(sq, knightDirections) for sq in range(64)]
+kingTargets = [targetSquares(sq, rayDirections) for sq in range(64)]
+rayTargets = [[targetSquares(sq, [(dr * i, dc * i) for i in range(1, 8)]) for dr, dc in rayDirections] for sq in range(64)]
+pawnAttackers = {"w": [targetSquares(sq, [(1, -1), (1, 1)]) for sq in range(64)],
+                 "b": [targetSquares(sq, [(-1, -1), (-1, 1)]) for sq in range(64)]}
 
 class GameState():
     def __init__(self):
@@ -30,24 +80,152 @@ class GameState():
         self.blackKingLocation = (0, 4)
         self.isCheck = False
         self.enpassantPossible = () #stores the coordinates of the square where an en passant capture move is possible.
-        self.enpassantPossibleLog = [self.enpassantPossible]
-        self.currentCastlingRight = CastlingRights(True, True, True, True)
-        self.castlingRightsLog = [CastlingRights(self.currentCastlingRight.wks, self.currentCastlingRight.wqs, 
-                                                self.currentCastlingRight.bks, self.currentCastlingRight.bqs)]
+        self.currentCastlingRight = CastlingRights(True, True, True, True) #changed in place, never replaced
+        self.halfmoveClock = 0 #plies since the last capture or pawn move, for the fifty-move rule
+        self.stateLog = [] #one packed state record per move in moveLog, after any history from load_fen
+        self.fullmoveNumber = 1 #starts at 1 and goes up after each black move
         self.pins = []
         self.checks = []
         self.checkMate = False
         self.staleMate = False
         self.moveFunctions = {'p':self.getPawnMoves, 'R':self.getRookMoves, 'N':self.getKnightMoves, 
                               'B':self.getBishopMoves, 'K':self.getKingMoves, 'Q':self.getQueenMoves}
+        self.zobristKey = self.computeZobristKey()
+        #running evaluation totals (white minus black), kept up to date by setSquare: material in pawns and
+        #piece-square bonuses in tenths of a pawn
+        self.materialScore, self.positionScore = self.computeEvaluationTotals()
+
+    """
+    Builds a position from a FEN string, e.g. GameState.from_fen("8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1"). Called on a
+    subclass it returns an instance of that subclass. The halfmove and fullmove fields may be left out.
+    """
+    @classmethod
+    def from_fen(cls, fen):
+        gs = cls()
+        gs.load_fen(fen)
+        return gs
+
+    """
+    Resets this object in place to the position given by a FEN string. This is the fast path for going through many
+    positions: the board lists, move function table and (in subclasses) bitboard dicts are reused instead of building
+    a new GameState for each one. Raises ValueError for a malformed FEN.
+    history is what repetitionHistory() returned in the game the FEN was taken from: the keys of the positions that
+    led to it, which go under stateLog so that isRepetition still sees them. A FEN alone carries no history.
+    """
+    def load_fen(self, fen, history=()):
+        fields = fen.split()
+        if len(fields) not in (4, 6):
+            raise ValueError("FEN needs 4 or 6 fields: " + fen)
+        placement, side, castling, enpassant = fields[:4]
+        ranks = placement.split("/")
+        if len(ranks) != 8:
+            raise ValueError("FEN piece placement needs 8 ranks: " + fen)
+        if side not in ("w", "b"):
+            raise ValueError("FEN side to move must be w or b: " + fen)
+        #parsed into locals first and written to the object only once the whole FEN has passed, so a rejected FEN leaves
+        #the position as it was
+        board = [["--"] * 8 for r in range(8)]
+        whiteKingLocation = blackKingLocation = None
+        for r in range(8):
+            row = board[r]
+            c = 0
+            for char in ranks[r]:
+                if char in "12345678":
+                    c += int(char)
+                elif char in fenToPiece and c < 8:
+                    piece = fenToPiece[char]
+                    if piece[1] == "p" and r in (0, 7):
+                        raise ValueError("FEN has a pawn on the first or last rank: " + fen)
+                    row[c] = piece
+                    if piece == "wK":
+                        whiteKingLocation = (r, c)
+                    elif piece == "bK":
+                        blackKingLocation = (r, c)
+                    c += 1
+                else:
+                    raise ValueError("bad FEN rank " + repr(ranks[r]) + ": " + fen)
+            if c != 8:
+                raise ValueError("FEN rank " + repr(ranks[r]) + " does not have 8 squares: " + fen)
+        if whiteKingLocation is None or blackKingLocation is None:
+            raise ValueError("FEN needs a king of each color: " + fen)
+        if castling != "-" and (not castling or any(char not in "KQkq" for char in castling)):
+            raise ValueError("bad FEN castling field: " + fen)
+        #a castling right needs its king and rook still on their home squares, or it would produce illegal castles
+        for char in castling.replace("-", ""):
+            row, king, rook = (7, "wK", "wR") if char.isupper() else (0, "bK", "bR")
+            if board[row][4] != king or board[row][7 if char in "Kk" else 0] != rook:
+                raise ValueError("FEN castling right " + char + " without its king and rook in place: " + fen)
+        if enpassant == "-":
+            enpassantPossible = ()
+        elif len(enpassant) == 2 and enpassant[0] in Move.filesToCols and enpassant[1] == ("6" if side == "w" else "3"):
+            enpassantPossible = (Move.ranksToRows[enpassant[1]], Move.filesToCols[enpassant[0]])
+        else:
+            raise ValueError("bad FEN en passant square: " + fen)
+        try:
+            halfmoveClock = int(fields[4]) if len(fields) == 6 else 0
+            fullmoveNumber = int(fields[5]) if len(fields) == 6 else 1
+        except ValueError:
+            raise ValueError("bad FEN move counters: " + fen)
+        for r in range(8):
+            self.board[r][:] = board[r] #the row lists are kept, other objects may hold them
+        self.enpassantPossible = enpassantPossible
+        self.halfmoveClock = halfmoveClock
+        self.fullmoveNumber = fullmoveNumber
+        self.whiteToMove = side == "w"
+        self.whiteKingLocation = whiteKingLocation
+        self.blackKingLocation = blackKingLocation
+        self.currentCastlingRight = CastlingRights("K" in castling, "Q" in castling, "k" in castling, "q" in castling)
+        self.stateLog = [key << STATE_KEY_SHIFT for key in history]
+        self.moveLog = []
+        self.moveRedo = []
+        self.isCheck = False
+        self.pins = []
+        self.checks = []
+        self.checkMate = False
+        self.staleMate = False
+        self.refreshDerivedState()
+
+    """
+    FEN string of the current position.
+    """
+    def to_fen(self):
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for piece in row:
+                if piece == "--":
+                    empty += 1
+                else:
+                    if empty:
+                        rank += str(empty)
+                        empty = 0
+                    rank += pieceToFen[piece]
+            ranks.append(rank + (str(empty) if empty else ""))
+        castlingRights = self.currentCastlingRight
+        castling = ("K" if castlingRights.wks else "") + ("Q" if castlingRights.wqs else "") + \
+                   ("k" if castlingRights.bks else "") + ("q" if castlingRights.bqs else "")
+        enpassant = Move.colsToFiles[self.enpassantPossible[1]] + Move.rowsToRanks[self.enpassantPossible[0]] \
+                    if self.enpassantPossible != () else "-"
+        return " ".join(["/".join(ranks), "w" if self.whiteToMove else "b", castling or "-", enpassant,
+                         str(self.halfmoveClock), str(self.fullmoveNumber)])
+
     """
     Takes a move as a parameter and executes it. Doesn't work with en passant, castling and pawn promotion
     """
 
-    def makeMove(self, move):
+    def makeMove(self, move, isRedo=False):
         if self.board[move.startrow][move.startcol] != "--":
-            self.board[move.startrow][move.startcol] = "--"
-            self.board[move.endrow][move.endcol] = move.piecemoved
+            #save what undoMove cannot work out from the move
+            enpassant = self.enpassantPossible
+            self.stateLog.append(self.zobristKey << STATE_KEY_SHIFT | self.halfmoveClock << STATE_CLOCK_SHIFT |
+                                 (enpassant[0] * 8 + enpassant[1] + 1 if enpassant else 0) << STATE_ENPASSANT_SHIFT |
+                                 self.currentCastlingRight.toBits())
+            if not isRedo:
+                self.moveRedo.clear() #a new move makes the undone ones unreachable
+            self.zobristKey ^= self.zobristStateKey() #XOR out the old castling rights and en passant square
+            self.setSquare(move.startrow, move.startcol, "--")
+            self.setSquare(move.endrow, move.endcol, move.piecemoved)
             self.moveLog.append(move) #logging the move to undo it later if needed
             self.whiteToMove = not self.whiteToMove #switch to other player
             #if a piece moved is a king, update its location
@@ -56,39 +234,40 @@ class GameState():
             elif move.piecemoved == 'bK':
                 self.blackKingLocation = (move.endrow, move.endcol) 
 
-            ischeck, checks, pins = self.findPinsOrChecks()
-            if ischeck:
-                move.isCheckMove = True
-
             #pawn promotion
             if move.isPawnPromotion:
-                print("Yes")
-                promotePiece = 'Q'
-                self.board[move.endrow][move.endcol] = move.piecemoved[0] + promotePiece
+                promotePiece = move.promotionPiece
+                self.setSquare(move.endrow, move.endcol, move.piecemoved[0] + promotePiece)
             
             #En Passant handling
             if move.isEnPassantMove:
                 move.piececaptured = self.board[move.startrow][move.endcol] #for undoing en passant move, recovering the captured pawn is done using this statement
-                self.board[move.startrow][move.endcol] = '--' #capturing the enemy pawn by making en passant move
+                self.setSquare(move.startrow, move.endcol, '--') #capturing the enemy pawn by making en passant move
 
             #whenever a pawn makes two square move, possible en passant square between starting and ending square needs to be tracked
-            self.enpassantPossible = ((move.startrow + move.endrow) // 2, move.startcol) if move.piecemoved[1] == 'p' and abs(move.endrow - move.startrow) == 2 else  ()
-            self.enpassantPossibleLog.append(self.enpassantPossible)
+            self.enpassantPossible = enpassantSquares[(move.startrow + move.endrow) // 2 * 8 + move.startcol + 1] if move.piecemoved[1] == 'p' and abs(move.endrow - move.startrow) == 2 else  ()
+
+            #move counters
+            self.halfmoveClock = 0 if move.piecemoved[1] == 'p' or move.piececaptured != '--' else self.halfmoveClock + 1
+            if move.piecemoved[0] == 'b':
+                self.fullmoveNumber += 1
             
             #castle move 
             if move.isCastleMove:
                 if move.endcol- move.startcol == 2: #king side castle move
-                    self.board[move.endrow][move. endcol - 1] = self.board[move.endrow][move. endcol + 1] #moves the rook
-                    self.board[move.endrow][move. endcol + 1] = '--'
+                    self.setSquare(move.endrow, move.endcol - 1, self.board[move.endrow][move.endcol + 1]) #moves the rook
+                    self.setSquare(move.endrow, move.endcol + 1, '--')
                 else: #queen side castle move
-                    self.board[move.endrow][move. endcol + 1] = self.board[move.endrow][move. endcol - 2] #moves the rook
-                    self.board[move.endrow][move. endcol - 2] = '--'
+                    self.setSquare(move.endrow, move.endcol + 1, self.board[move.endrow][move.endcol - 2]) #moves the rook
+                    self.setSquare(move.endrow, move.endcol - 2, '--')
 
             #update castling rights, whenever a rook or a king moves
             self.updateCastleRights(move)
-            #add the new castling rights to the log
-            self.castlingRightsLog.append(CastlingRights(self.currentCastlingRight.wks, self.currentCastlingRight.wqs, 
-                                                self.currentCastlingRight.bks, self.currentCastlingRight.bqs))
+            self.zobristKey ^= self.zobristStateKey() ^ zobristBlackToMoveKey
+            if DEBUG_ZOBRIST:
+                self.checkZobristKey()
+            if DEBUG_EVALUATION:
+                self.checkEvaluationTotals()
 
     """
     Undo the last move
@@ -96,8 +275,9 @@ class GameState():
     def undoMove(self):
         if len(self.moveLog) > 0: #making sure that there is a move to undo
             move = self.moveLog.pop()
-            self.board[move.startrow][move.startcol] = move.piecemoved
-            self.board[move.endrow][move.endcol] = move.piececaptured
+            state = self.stateLog.pop()
+            self.setSquare(move.startrow, move.startcol, move.piecemoved)
+            self.setSquare(move.endrow, move.endcol, move.piececaptured)
             self.whiteToMove = not self.whiteToMove #switch to other player
             #if a piece moved is a king, update its location
             if move.piecemoved == 'wK':
@@ -107,34 +287,110 @@ class GameState():
 
             #En Passant
             if move.isEnPassantMove:
-                self.board[move.endrow][move.endcol] = '--'
-                self.board[move.startrow][move.endcol] = move.piececaptured
-
-            #Two square pawn moves
-            if move.piecemoved[1] == 'p' and abs(move.endrow - move.startrow) == 2:
-                self.enpassantPossible = ()
+                self.setSquare(move.endrow, move.endcol, '--')
+                self.setSquare(move.startrow, move.endcol, move.piececaptured)
 
             #undo castle move
             if move.isCastleMove:
                 if move.endcol- move.startcol == 2: #king side castle move
-                    self.board[move.endrow][move.endcol + 1] = self.board[move.endrow][move.endcol - 1]
-                    self.board[move.endrow][move.endcol - 1] = '--'
+                    self.setSquare(move.endrow, move.endcol + 1, self.board[move.endrow][move.endcol - 1])
+                    self.setSquare(move.endrow, move.endcol - 1, '--')
                 else: #queen side castle move
-                    self.board[move.endrow][move. endcol - 2] = self.board[move.endrow][move. endcol + 1] #moves the rook
-                    self.board[move.endrow][move. endcol + 1] = '--'
+                    self.setSquare(move.endrow, move.endcol - 2, self.board[move.endrow][move.endcol + 1]) #moves the rook
+                    self.setSquare(move.endrow, move.endcol + 1, '--')
             
-            self.enpassantPossibleLog.pop()
-            self.enpassantPossible = self.enpassantPossibleLog[-1]
+            if move.piecemoved[0] == 'b':
+                self.fullmoveNumber -= 1
 
-            #undo castle rights
-            self.castlingRightsLog.pop() #while undoing, we delete the latest castling rights object
-            castle_rights = copy.deepcopy(self.castlingRightsLog[-1])
-            self.currentCastlingRight = castle_rights #and set the current castling rights to the previous, now last rights from the log.
+            #restore the en passant square, halfmove clock, castling rights and Zobrist key saved by makeMove
+            self.enpassantPossible = enpassantSquares[state >> STATE_ENPASSANT_SHIFT & 127]
+            self.halfmoveClock = state >> STATE_CLOCK_SHIFT & 0xFFFF
+            self.currentCastlingRight.setBits(state & 15)
+            self.zobristKey = state >> STATE_KEY_SHIFT
+            if DEBUG_ZOBRIST:
+                self.checkZobristKey()
+            if DEBUG_EVALUATION:
+                self.checkEvaluationTotals()
 
             self.moveRedo.append(move)
 
             self.checkMate = False
             self.staleMate = False 
+
+    """
+    Puts a piece (or "--" for an empty square) on the board. makeMove and undoMove route every board write
+    through here, so a subclass holding another board representation (see BitboardEngine) can keep it in sync.
+    """
+    def setSquare(self, r, c, piece):
+        oldPiece = self.board[r][c]
+        sq = r * 8 + c
+        if oldPiece != '--':
+            self.zobristKey ^= zobristPieceKeys[oldPiece][sq]
+            self.materialScore -= materialValues[oldPiece]
+            self.positionScore -= positionValues[oldPiece][sq]
+        if piece != '--':
+            self.zobristKey ^= zobristPieceKeys[piece][sq]
+            self.materialScore += materialValues[piece]
+            self.positionScore += positionValues[piece][sq]
+        self.board[r][c] = piece
+
+    """
+    Zobrist contribution of the castling rights and the en passant square. As in Polyglot, the en passant file only
+    counts when a pawn of the side to move stands next to the pawn that just moved two squares, so could take it;
+    otherwise the position is the same as if the pawn had arrived in two moves, and hashes the same.
+    """
+    def zobristStateKey(self):
+        key = zobristCastlingTable[self.currentCastlingRight.toBits()]
+        if self.enpassantPossible != ():
+            r, c = self.enpassantPossible
+            pawnRow, pawn = (r + 1, 'wp') if self.whiteToMove else (r - 1, 'bp')
+            row = self.board[pawnRow]
+            if (c > 0 and row[c - 1] == pawn) or (c < 7 and row[c + 1] == pawn):
+                key ^= zobristEnpassantKeys[c]
+        return key
+
+    """
+    Computes the Zobrist key of the current position from scratch. makeMove/undoMove keep self.zobristKey up to date
+    incrementally; this is the slow reference used to check them.
+    """
+    def computeZobristKey(self):
+        key = self.zobristStateKey()
+        if not self.whiteToMove:
+            key ^= zobristBlackToMoveKey
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != '--':
+                    key ^= zobristPieceKeys[piece][r * 8 + c]
+        return key
+
+    def checkZobristKey(self):
+        assert self.zobristKey == self.computeZobristKey(), "incremental Zobrist key out of sync with the board"
+
+    """
+    Recomputes everything that makeMove/undoMove normally keep up to date incrementally. Call it after setting up a
+    position by writing the board and state fields directly.
+    """
+    def refreshDerivedState(self):
+        self.zobristKey = self.computeZobristKey()
+        self.materialScore, self.positionScore = self.computeEvaluationTotals()
+
+    """
+    Material and piece-square totals computed by scanning the whole board, to check the running totals against.
+    """
+    def computeEvaluationTotals(self):
+        materialScore = positionScore = 0
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != '--':
+                    materialScore += materialValues[piece]
+                    positionScore += positionValues[piece][r * 8 + c]
+        return materialScore, positionScore
+
+    def checkEvaluationTotals(self):
+        assert (self.materialScore, self.positionScore) == self.computeEvaluationTotals(), \
+            "running evaluation totals out of sync with the board"
     
     def updateCastleRights(self, move):
         if move.piecemoved == 'wK':
@@ -176,40 +432,8 @@ class GameState():
     def redoMove(self):
         if len(self.moveRedo) > 0: #making sure that there are previously undoed moves to redo
             move = self.moveRedo.pop()
-            self.board[move.startrow][move.startcol] = "--"
-            self.board[move.endrow][move.endcol] = move.piecemoved
-            self.whiteToMove = not self.whiteToMove #switch to other player
-            #if a piece moved is a king, update its location
-            if move.piecemoved == 'wK':
-                self.whiteKingLocation = (move.endrow, move.endcol)
-            elif move.piecemoved == 'bK':
-                self.blackKingLocation = (move.endrow, move.endcol) 
-
-            if move.isEnPassantMove:
-                move.piececaptured = self.board[move.startrow][move.endcol]
-                self.board[move.startrow][move.endcol] = '--' #capturing the enemy pawn by making en passant move
-                self.enpassantPossible.pop()
-
-            #whenever a pawn makes two square move, possible en passant square between starting and ending square needs to be tracked
-            if move.piecemoved[1] == 'p' and abs(move.endrow - move.startrow) == 2: 
-                self.enpassantPossible.append(((move.startrow + move.endrow) // 2, move.startcol))
-            
-            #castle move 
-            if move.isCastleMove:
-                if move.endcol- move.startcol == 2: #king side castle move
-                    self.board[move.endrow][move. endcol - 1] = self.board[move.endrow][move. endcol + 1] #moves the rook
-                    self.board[move.endrow][move. endcol + 1] = '--'
-                else:
-                    self.board[move.endrow][move. endcol + 1] = self.board[move.endrow][move. endcol - 2] #moves the rook
-                    self.board[move.endrow][move. endcol - 2] = '--'
-
-            #update castling rights, whenever a rook or a king moves
-            self.updateCastleRights(move)
-            #add the new castling rights to the log
-            self.castlingRightsLog.append(CastlingRights(self.currentCastlingRight.wks, self.currentCastlingRight.wqs, 
-                                                self.currentCastlingRight.bks, self.currentCastlingRight.bqs))
-
-            self.moveLog.append(move)
+            #replaying the move through makeMove keeps the en passant, castling and promotion handling in one place
+            self.makeMove(move, isRedo=True)
     
     """
     determine valid moves for a piece considering checks from the opponent (advanced algorithm)
@@ -217,6 +441,8 @@ class GameState():
     def getValidMoves(self):
         moves = []
         self.isCheck, self.checks, self.pins = self.findPinsOrChecks()
+        if self.moveLog:
+            self.moveLog[-1].isCheckMove = self.isCheck #for the move log display; makeMove does not look for checks
         if self.whiteToMove:
             kingRow = self.whiteKingLocation[0]
             kingCol = self.whiteKingLocation[1]
@@ -227,25 +453,12 @@ class GameState():
             if len(self.checks) == 1: #only one enemy piece is checking the king, so block the check, move king or remove attacking piece
                 moves = self.getAllPossibleMoves()
                 check = self.checks[0]
-                checkRow = check[0]
-                checkCol = check[1]
-                pieceChecking = self.board[checkRow][checkCol] #get info about the piece that's checking
-                validSquares = [] #valid locations where pieces can move to block the king from being checked
-                #if attacking piece is a knight, only option is to capture it or move the king
-                if pieceChecking[1] == 'N':
-                    validSquares = [(checkRow, checkCol)]
-                else:
-                    for i in range(8):
-                        validSquares.append((kingRow + check[2] * i, kingCol + check[3] * i)) #check[2] and check[3] are the check directions
-                        # we have reached the checking piece and captured all possible locations where other pieces could move
-                        if validSquares[0] == checkRow and validSquares[1] == checkCol: 
-                            break
-
-                #remove all moves that do not block a check or move the king    
-                for i in range(len(moves) - 1, -1, -1):
-                    if moves[i].piecemoved[1] != 'K': #move did not change location of king 
-                        if not (moves[i].endrow, moves[i].endcol) in validSquares: #moves that don't block the king
-                            moves.remove(moves[i])
+                validSquares = self.checkBlockSquares(kingRow, kingCol, check)
+                #keep only the moves that block the check, capture the checking piece or move the king. One pass
+                #building a new list; removing from the list one move at a time was quadratic
+                #an en passant capture lands behind the pawn it takes, so the captured pawn's square counts too
+                moves = [move for move in moves if move.piecemoved[1] == 'K' or (move.endrow, move.endcol) in validSquares
+                         or (move.isEnPassantMove and (move.startrow, move.endcol) in validSquares)]
             else: #if double or more checks, then king has to move
                 self.getKingMoves(kingRow, kingCol, moves)
         else: #no check, all moves (except pinned pieces, dealt later) are valid
@@ -276,6 +489,98 @@ class GameState():
         #     self.staleMate = False
         return moves
 
+    """
+    The squares a piece other than the king may move to against a single check, as a set: the checking piece's square,
+    and for a slider the squares between it and the king at (kingRow, kingCol). check is an entry of findPinsOrChecks.
+    """
+    def checkBlockSquares(self, kingRow, kingCol, check):
+        checkRow, checkCol, dr, dc = check
+        if self.board[checkRow][checkCol][1] == 'N': #a knight's check can only be answered by taking it or moving the king
+            return {(checkRow, checkCol)}
+        validSquares = set()
+        for i in range(1, 8):
+            validSquares.add((kingRow + dr * i, kingCol + dc * i))
+            if kingRow + dr * i == checkRow and kingCol + dc * i == checkCol:
+                break
+        return validSquares
+
+    """
+    Legal captures (including en passant) and promotions only, for the quiescence search. The mailbox generator has no
+    capture-only mode, so this filters the full list; BitboardGameState generates the captures directly.
+    """
+    def getCaptureMoves(self):
+        checkMate, staleMate = self.checkMate, self.staleMate
+        moves = [move for move in self.getValidMoves() if move.isCapture or move.isEnPassantMove or move.isPawnPromotion]
+        self.checkMate, self.staleMate = checkMate, staleMate #an empty capture list is not a checkmate or stalemate
+        return moves
+
+    """
+    Legal moves that are neither captures nor promotions, castling included.
+    """
+    def getQuietMoves(self):
+        checkMate, staleMate = self.checkMate, self.staleMate
+        moves = [move for move in self.getValidMoves() if not (move.isCapture or move.isEnPassantMove or move.isPawnPromotion)]
+        self.checkMate, self.staleMate = checkMate, staleMate
+        return moves
+
+    """
+    Generator of the legal moves in search order: the transposition table move first, then captures and promotions,
+    killers and the other quiet moves, as sorted by orderer (a MoveOrderer). The search stops pulling moves at a cutoff.
+    The mailbox generator cannot produce a stage on its own, so this builds the full list once and yields it in order;
+    BitboardGameState generates each stage only when it is reached.
+    """
+    def stagedMoves(self, orderer, ply, ttMoveID=None):
+        checkMate, staleMate = self.checkMate, self.staleMate
+        moves = self.getValidMoves()
+        self.checkMate, self.staleMate = checkMate, staleMate #the search decides mate and stalemate itself
+        for move in orderer.orderMoves(moves, ply, ttMoveID):
+            yield move
+
+    """
+    True if the current position occurred at least times times before in the game. The Zobrist keys of the earlier
+    positions are already on stateLog, and only positions since the last capture or pawn move (halfmoveClock plies)
+    with the same side to move can repeat, so this compares at most halfmoveClock / 2 ints. The search asks with
+    times=1 at every node, since a side that could repeat once can repeat again; threefold repetition is times=2.
+    """
+    def isRepetition(self, times=1):
+        stateLog = self.stateLog
+        key = self.zobristKey
+        end = len(stateLog)
+        for i in range(end - 2, end - 1 - min(self.halfmoveClock, end), -2):
+            if stateLog[i] >> STATE_KEY_SHIFT == key:
+                times -= 1
+                if times == 0:
+                    return True
+        return False
+
+    """
+    The Zobrist keys of the earlier positions this one could still repeat, the ones since the last capture or pawn
+    move, oldest first. Pass them to load_fen along with to_fen() to rebuild the position with its repetitions.
+    """
+    def repetitionHistory(self):
+        stateLog = self.stateLog
+        return [state >> STATE_KEY_SHIFT for state in stateLog[len(stateLog) - min(self.halfmoveClock, len(stateLog)):]]
+
+    """
+    Why the game is drawn by rule, or None: "fifty-move rule" after 100 plies without a capture or pawn move, or
+    "threefold repetition". A checkmate on the last of those plies still wins, so call getValidMoves first to set
+    checkMate.
+    """
+    def drawReason(self):
+        if self.halfmoveClock >= 100 and not self.checkMate:
+            return "fifty-move rule"
+        if self.isRepetition(2):
+            return "threefold repetition"
+        return None
+
+    """
+    True if the side to move has a legal move, setting checkMate or staleMate like getValidMoves when it has none, for
+    callers that only need to know whether the game is over. The mailbox generator works a whole position at a time,
+    so this generates every move; BitboardGameState stops at the first piece that has one.
+    """
+    def hasLegalMove(self):
+        return len(self.getValidMoves()) > 0
+
     # def inCheck(self):
     #     #calling makeMove() function switches turn to opponent, so we use not whiteToMove to point to current player
     #     if not self.whiteToMove:
@@ -306,56 +611,120 @@ class GameState():
             enemyColor = 'w'
             startrow = self.blackKingLocation[0]
             startcol = self.blackKingLocation[1] 
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, 1), (1, -1)]
-        for j in range(len(directions)):
-            d = directions[j]
+        kingRays = rayTargets[startrow * 8 + startcol]
+        for j in range(8):
+            d = rayDirections[j]
             possiblePin = ()
-            for i in range(1, 8):
-                endrow = startrow + d[0] * i
-                endcol = startcol + d[1] * i
-                if 0 <= endrow <= 7 and 0 <= endcol <= 7: #inside board
-                    endPiece = self.board[endrow][endcol]
-                    if endPiece[0] == allyColor and endPiece[1] != 'K':
-                        if possiblePin == (): #1st allied piece found in a given direction can become a possible pin. 
-                            possiblePin = (endrow, endcol, d[0], d[1])
-                        else: #another allied piece, if found in the same direction cancels the pinning effect from an attacking enemy piece along that direction
-                            break
-                    elif endPiece[0] == enemyColor: #if an enemy piece found in a given direction
-                        type = endPiece[1] # then we need to perform operations based on type of the piece
-                        #There are 5 conditions that can be applicable based on the type of enemy piece encountered in a given direction.
-                        #1) If the piece is a rook and it is orthogonally away from a king
-                        #2) If the piece is a bishop and diagonally away from a king
-                        #3) If the piece is a pawn and one square away from a king diagonally
-                        #4) If the piece is a queen attacking from any direction
-                        #5) If the piece is the enemy king and 1 square away in all 8 directions.
-                        if (type == 'R' and 0 <= j <= 3) or (type == 'B' and 4 <= j <= 7) or \
-                            (type == 'p' and i == 1 and ((enemyColor == 'w' and 6 <= j <= 7) or (enemyColor == 'b' and 4 <= j <= 5))) or \
-                                (type == 'Q') or (type == 'K' and i == 1):
-                                if possiblePin == (): #no allied pieces blocking the king and only enemy piece is present, in such a case, king is in check
-                                    isCheck = True
-                                    checks.append((endrow, endcol, d[0], d[1]))
-                                else: #pinned piece found
-                                    pins.append(possiblePin)
-                        else: #enemy piece present but not attacking
-                            break 
-                else: #outside board
-                    break
+            for i, (endrow, endcol) in enumerate(kingRays[j], 1):
+                endPiece = self.board[endrow][endcol]
+                if endPiece[0] == allyColor and endPiece[1] != 'K':
+                    if possiblePin == (): #1st allied piece found in a given direction can become a possible pin. 
+                        possiblePin = (endrow, endcol, d[0], d[1])
+                    else: #another allied piece, if found in the same direction cancels the pinning effect from an attacking enemy piece along that direction
+                        break
+                elif endPiece[0] == enemyColor: #if an enemy piece found in a given direction
+                    type = endPiece[1] # then we need to perform operations based on type of the piece
+                    #There are 5 conditions that can be applicable based on the type of enemy piece encountered in a given direction.
+                    #1) If the piece is a rook and it is orthogonally away from a king
+                    #2) If the piece is a bishop and diagonally away from a king
+                    #3) If the piece is a pawn and one square away from a king diagonally
+                    #4) If the piece is a queen attacking from any direction
+                    #5) If the piece is the enemy king and 1 square away in all 8 directions.
+                    if (type == 'R' and 0 <= j <= 3) or (type == 'B' and 4 <= j <= 7) or \
+                        (type == 'p' and i == 1 and ((enemyColor == 'w' and 6 <= j <= 7) or (enemyColor == 'b' and 4 <= j <= 5))) or \
+                            (type == 'Q') or (type == 'K' and i == 1):
+                            if possiblePin == (): #no allied pieces blocking the king and only enemy piece is present, in such a case, king is in check
+                                isCheck = True
+                                checks.append((endrow, endcol, d[0], d[1]))
+                            else: #pinned piece found
+                                pins.append(possiblePin)
+                            break #pieces behind the first enemy piece are blocked by it
+                    else: #enemy piece present but not attacking
+                        break 
 
         #checks for knight pieces
-        knightDirections = [(-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, 2), (1, -2)]
-        for i in range(len(knightDirections)):
-            d = knightDirections[i]
-            endrow = startrow + d[0]
-            endcol = startcol + d[1]
-            if 0 <= endrow < 8 and 0 <= endcol < 8: #inside board
-                endPiece = self.board[endrow][endcol]
-                if endPiece[0] == enemyColor and endPiece[1] == 'N':
-                    isCheck = True
-                    checks.append((endrow, endcol, d[0], d[1]))
-            else: #outside board
-                break
+        enemyKnight = enemyColor + 'N'
+        for endrow, endcol in knightTargets[startrow * 8 + startcol]:
+            if self.board[endrow][endcol] == enemyKnight:
+                isCheck = True
+                checks.append((endrow, endcol, endrow - startrow, endcol - startcol))
         return isCheck, checks, pins
 
+    """
+    Returns True if the king of the player to move is in check.
+    """
+    def inCheck(self):
+        if self.whiteToMove:
+            return self.isSquareAttacked(self.whiteKingLocation[0] * 8 + self.whiteKingLocation[1], 'b')
+        return self.isSquareAttacked(self.blackKingLocation[0] * 8 + self.blackKingLocation[1], 'w')
+
+    """
+    Returns True if a piece of color byColor ('w' or 'b') attacks square sq (row*8+col). Looks outwards from sq with
+    the precomputed tables: pawn and knight squares, the adjacent squares for the king, and the eight rays up to the
+    first piece on each.
+    """
+    def isSquareAttacked(self, sq, byColor):
+        board = self.board
+        pawn, knight, king = byColor + 'p', byColor + 'N', byColor + 'K'
+        for r, c in pawnAttackers[byColor][sq]:
+            if board[r][c] == pawn:
+                return True
+        for r, c in knightTargets[sq]:
+            if board[r][c] == knight:
+                return True
+        for r, c in kingTargets[sq]:
+            if board[r][c] == king:
+                return True
+        rook, bishop, queen = byColor + 'R', byColor + 'B', byColor + 'Q'
+        rays = rayTargets[sq]
+        for j in range(8):
+            slider = rook if j < 4 else bishop
+            for r, c in rays[j]:
+                piece = board[r][c]
+                if piece != '--':
+                    if piece == slider or piece == queen:
+                        return True
+                    break
+        return False
+
+    """
+    Returns True if move (one of the valid moves) would put the opponent in check, without making it. The board is read
+    as it would be after the move: a knight or pawn checks from its new square, and along each of the eight rays from the
+    enemy king the first piece decides, which finds a slider's direct check, the rook's after castling, and a check
+    uncovered by the piece leaving its square (or by the pawn taken en passant leaving its own).
+    """
+    def givesCheck(self, move):
+        board = self.board
+        allyColor = move.piecemoved[0]
+        kingRow, kingCol = self.blackKingLocation if allyColor == 'w' else self.whiteKingLocation
+        kingSq = kingRow * 8 + kingCol
+        placed = allyColor + move.promotionPiece if move.isPawnPromotion else move.piecemoved
+        endSquare = (move.endrow, move.endcol)
+        if placed[1] == 'N':
+            if endSquare in knightTargets[kingSq]:
+                return True
+        elif placed[1] == 'p':
+            if endSquare in pawnAttackers[allyColor][kingSq]:
+                return True
+        #the squares the move changes, read in place of the board's
+        changed = {(move.startrow, move.startcol): '--', endSquare: placed}
+        if move.isEnPassantMove:
+            changed[(move.startrow, move.endcol)] = '--'
+        elif move.isCastleMove:
+            rookFrom, rookTo = (7, 5) if move.endcol > move.startcol else (0, 3)
+            changed[(move.endrow, rookFrom)] = '--'
+            changed[(move.endrow, rookTo)] = allyColor + 'R'
+        rook, bishop, queen = allyColor + 'R', allyColor + 'B', allyColor + 'Q'
+        rays = rayTargets[kingSq]
+        for j in range(8):
+            slider = rook if j < 4 else bishop
+            for square in rays[j]:
+                piece = changed[square] if square in changed else board[square[0]][square[1]]
+                if piece != '--':
+                    if piece == slider or piece == queen:
+                        return True
+                    break
+        return False
 
 
     """
@@ -390,6 +759,22 @@ class GameState():
                 break
         return attack, block
 
+    """
+    False if taking en passant with the pawn on (r, c) onto column endcol would leave the king at (kingRow, kingCol)
+    open to a rook or queen along its rank, both pawns leaving the rank at once; a pin on the capturing pawn alone is
+    not looked at here.
+    """
+    def enPassantKeepsRankSafe(self, r, c, endcol, enemyColor, kingRow, kingCol):
+        if kingRow != r:
+            return True
+        low, high = min(c, endcol), max(c, endcol)
+        if kingCol < low:
+            insideRange, outsideRange = range(kingCol + 1, low), range(high + 1, 8)
+        else:
+            insideRange, outsideRange = range(kingCol - 1, high, -1), range(low - 1, -1, -1)
+        attackingPiece, blockingPiece = self.enPassantKingChecks(r, enemyColor, insideRange, outsideRange)
+        return not attackingPiece or blockingPiece
+
     def getPawnMoves(self, r, c, moves):
         piecePinned = False
         pinDirection = ()
@@ -415,39 +800,41 @@ class GameState():
         pawnPromotion = False
         
         if self.board[r + moveAmt][c] == '--':
-            if not piecePinned or pinDirection == (moveAmt, 0):
+            if not piecePinned or pinDirection == (moveAmt, 0) or pinDirection == (-moveAmt, 0): #a pinned pawn may still move along the pin line
                 if r + moveAmt == backrow: # if piece gets into back rank, then pawn promotion possible
                     pawnPromotion = True
-                moves.append(Move((r, c), (r + moveAmt, c), self.board, pawnPromotion = pawnPromotion))
+                self.addPawnMoves(moves, (r, c), (r + moveAmt, c), pawnPromotion)
                 if r == startrow and self.board[r + (2*moveAmt)][c] == '--': #pawn two square move
                     moves.append(Move((r, c), (r + (2*moveAmt), c), self.board))
         if c != 0: #capture to left
-            if not piecePinned or pinDirection == (moveAmt, -1):
+            if not piecePinned or pinDirection == (moveAmt, -1) or pinDirection == (-moveAmt, 1):
                 if (self.board[r + moveAmt][c - 1][0] == enemyColor):
                     if r + moveAmt == backrow: # if piece gets into back rank, then pawn promotion possible
                         pawnPromotion = True
-                    moves.append(Move((r, c), (r + moveAmt, c - 1), self.board, pawnPromotion = pawnPromotion))
+                    self.addPawnMoves(moves, (r, c), (r + moveAmt, c - 1), pawnPromotion)
                 elif (r + moveAmt, c - 1) == self.enpassantPossible:
-                    attackingPiece = blockingPiece = False
-                    if kingRow == r:
-                        insideRange, outsideRange = (range(kingCol + 1, c - 1), range(c + 1, 8)) if kingCol < c else (range(kingCol - 1, c, -1), range(c - 2, -1, -1))
-                        attackingPiece, blockingPiece = self.enPassantKingChecks(r, enemyColor, insideRange, outsideRange)
-                    if not attackingPiece or blockingPiece:
+                    if self.enPassantKeepsRankSafe(r, c, c - 1, enemyColor, kingRow, kingCol):
                         moves.append(Move((r, c), (r + moveAmt, c - 1), self.board, isEnPassantMove=True)) 
         if c != 7: #capture to right
-            if not piecePinned or pinDirection == (moveAmt, 1):
+            if not piecePinned or pinDirection == (moveAmt, 1) or pinDirection == (-moveAmt, -1):
                 if(self.board[r + moveAmt][c + 1][0] == enemyColor):
                     if r + moveAmt == backrow: # if piece gets into back rank, then pawn promotion possible
                         pawnPromotion = True
-                    moves.append(Move((r, c), (r + moveAmt, c + 1), self.board, pawnPromotion = pawnPromotion))
+                    self.addPawnMoves(moves, (r, c), (r + moveAmt, c + 1), pawnPromotion)
                 elif (r + moveAmt, c + 1) == self.enpassantPossible:
-                    attackingPiece = blockingPiece = False
-                    if kingRow == r:
-                        insideRange, outsideRange = (range(kingCol + 1, c), range(c + 2, 8)) if kingCol < c else (range(kingCol - 1, c + 1, -1), range(c - 1, -1, -1))
-                        attackingPiece, blockingPiece = self.enPassantKingChecks(r, enemyColor, insideRange, outsideRange)
-                    if not attackingPiece or blockingPiece:
+                    if self.enPassantKeepsRankSafe(r, c, c + 1, enemyColor, kingRow, kingCol):
                         moves.append(Move((r, c), (r + moveAmt, c + 1), self.board, isEnPassantMove=True)) 
 
+    """
+    Adds a pawn move to the list; a move onto the back rank is added once per piece the pawn can promote to.
+    """
+    def addPawnMoves(self, moves, startPos, endPos, pawnPromotion):
+        if pawnPromotion:
+            for promotionPiece in Move.promotionPieces:
+                moves.append(Move(startPos, endPos, self.board, pawnPromotion=True, promotionPiece=promotionPiece))
+        else:
+            moves.append(Move(startPos, endPos, self.board))
+
     """
     Get all rook moves for a rook at a given row and column and add these to the list of all moves
     """ 
@@ -464,23 +851,20 @@ class GameState():
                 break
 
 
-        enemyPiece = 'b' if self.whiteToMove else 'w'
-        directions = [(-1, 0), (0, -1), (1, 0), (0, 1)] #top, left, bottom, right
-        for d in directions:
-            for i in range(1, 8):
-                endrow = r + d[0] * i
-                endcol = c + d[1] * i
-                if 0 <= endrow < 8 and 0 <= endcol < 8: #inside board
-                    if not piecePinned or (pinDirection == d or pinDirection == (-d[0], -d[1])):
-                        endPiece = self.board[endrow][endcol]
-                        if endPiece == '--': 
-                            moves.append(Move((r, c), (endrow, endcol), self.board))
-                        elif endPiece[0] == enemyPiece:
-                            moves.append(Move((r, c), (endrow, endcol), self.board))
-                            break
-                        else:
-                            break 
-                else: #outside board
+        allyPiece = 'w' if self.whiteToMove else 'b'
+        fromSq = r * 8 + c
+        piece = self.board[r][c]
+        rays = rayTargets[fromSq]
+        for j in range(4): #the orthogonal rays of rayDirections
+            d = rayDirections[j]
+            if piecePinned and pinDirection != d and pinDirection != (-d[0], -d[1]):
+                continue
+            for endrow, endcol in rays[j]:
+                endPiece = self.board[endrow][endcol]
+                if endPiece[0] == allyPiece:
+                    break
+                moves.append(Move.plain(fromSq, endrow * 8 + endcol, piece, endPiece))
+                if endPiece != '--': #a capture ends the ray
                     break
 
     """
@@ -494,17 +878,12 @@ class GameState():
                 self.pins.remove(self.pins[i])
                 break 
 
+        if piecePinned: #a knight never moves along its pin line
+            return
         allyPiece = 'w' if self.whiteToMove else 'b'
-        #four orientations of L shaped move, each with its own reflections, so total 8 moves possible
-        directions = [(-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, 2), (1, -2)] 
-        for d in directions:
-            endrow = r + d[0] 
-            endcol = c + d[1] 
-            if 0 <= endrow < 8 and 0 <= endcol < 8: #inside board
-                if not piecePinned:
-                    endPiece = self.board[endrow][endcol]
-                    if endPiece[0] != allyPiece:
-                        moves.append(Move((r, c), (endrow, endcol), self.board))
+        for endrow, endcol in knightTargets[r * 8 + c]:
+            if self.board[endrow][endcol][0] != allyPiece:
+                moves.append(Move((r, c), (endrow, endcol), self.board))
 
     """
     Get all bishop moves for a bishop at a given row and column and add these to the list of all moves
@@ -517,55 +896,41 @@ class GameState():
             if self.pins[i][0] == r and self.pins[i][1] == c:
                 piecePinned = True
                 pinDirection = (self.pins[i][2], self.pins[i][3])
-                self.pins.remove(self.pins[i])
+                if self.board[r][c][1] != 'Q': #a pinned queen keeps its pin for getRookMoves, which runs after this
+                    self.pins.remove(self.pins[i])
                 break
 
-        enemyPiece = 'b' if self.whiteToMove else 'w'
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)] #north-west, north-east, south-west, south-east
-        for d in directions:
-            for i in range(1, 8):
-                endrow = r + d[0] * i
-                endcol = c + d[1] * i
-                if 0 <= endrow < 8 and 0 <= endcol < 8: #inside board
-                    if not piecePinned or (pinDirection == d or pinDirection == (-d[0], -d[1])):
-                        endPiece = self.board[endrow][endcol]
-                        if endPiece == '--': 
-                            moves.append(Move((r, c), (endrow, endcol), self.board))
-                        elif endPiece[0] == enemyPiece:
-                            moves.append(Move((r, c), (endrow, endcol), self.board))
-                            break
-                        else:
-                            break 
-                else: #outside board
+        allyPiece = 'w' if self.whiteToMove else 'b'
+        fromSq = r * 8 + c
+        piece = self.board[r][c]
+        rays = rayTargets[fromSq]
+        for j in range(4, 8): #the diagonal rays of rayDirections
+            d = rayDirections[j]
+            if piecePinned and pinDirection != d and pinDirection != (-d[0], -d[1]):
+                continue
+            for endrow, endcol in rays[j]:
+                endPiece = self.board[endrow][endcol]
+                if endPiece[0] == allyPiece:
+                    break
+                moves.append(Move.plain(fromSq, endrow * 8 + endcol, piece, endPiece))
+                if endPiece != '--': #a capture ends the ray
                     break
 
     """
     Get all king moves for a king at a given row and column and add these to the list of all moves
     """
     def getKingMoves(self, r, c, moves):
-        temp_moves = []
         allyPiece = 'w' if self.whiteToMove else 'b'
-        directions = [(-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)] 
-        for i in range(8):
-            endrow = r + directions[i][0]
-            endcol = c + directions[i][1]
-            if 0 <= endrow < 8 and 0 <= endcol < 8:
-                endPiece = self.board[endrow][endcol]
-                if endPiece[0] != allyPiece: #empty or enemy piece
-                    #move king to that location
-                    if allyPiece == 'w':
-                        self.whiteKingLocation = (endrow, endcol)
-                    else:
-                        self.blackKingLocation = (endrow, endcol)
-                    #determine the value of isCheck, to see if the king is in check after placing the king in the new location
-                    isCheck, checks, pins = self.findPinsOrChecks()
-                    if not isCheck: #if king is not in check after the movemement
-                        moves.append(Move((r, c), (endrow, endcol), self.board))
-                    #move the king back to its original place
-                    if allyPiece == 'w':
-                        self.whiteKingLocation = (r, c)
-                    else:
-                        self.blackKingLocation = (r, c)
+        enemyColor = 'b' if self.whiteToMove else 'w'
+        king = self.board[r][c]
+        #lift the king off its square while testing its targets, so a slider checking it along a line still covers
+        #the square behind it. Written directly rather than with setSquare: nothing else sees the board meanwhile
+        self.board[r][c] = '--'
+        safeSquares = [(endrow, endcol) for endrow, endcol in kingTargets[r * 8 + c] if self.board[endrow][endcol][0] !=
+                       allyPiece and not self.isSquareAttacked(endrow * 8 + endcol, enemyColor)]
+        self.board[r][c] = king
+        for endSquare in safeSquares:
+            moves.append(Move((r, c), endSquare, self.board))
 
         self.getCastleMoves(r, c, moves, allyPiece)
     
@@ -574,8 +939,7 @@ class GameState():
     '''
 
     def getCastleMoves(self, r, c, moves, allyPiece):
-        isCheck, checks, pins = self.findPinsOrChecks()
-        if isCheck:
+        if self.isCheck:
             return #we cannot castle the king as it is in check
         #if king side is vacant
         if (self.whiteToMove and self.currentCastlingRight.wks) or (not self.whiteToMove and self.currentCastlingRight.bks):
@@ -585,18 +949,9 @@ class GameState():
             self.getQueenSideCastleMoves(r, c, moves, allyPiece)
     
     def castleSquareChecks(self, r, c, allyPiece, moveAmt):
-        if allyPiece == 'w':
-            self.whiteKingLocation = (r, c + moveAmt)
-            checkSqOne, ch, p = self.findPinsOrChecks()
-            self.whiteKingLocation = (r, c + 2*moveAmt)
-            checkSqTwo, ch, p = self.findPinsOrChecks()
-            self.whiteKingLocation = (r, c)
-        else:
-            self.blackKingLocation = (r, c + moveAmt)
-            checkSqOne, ch, p = self.findPinsOrChecks()
-            self.blackKingLocation = (r, c + 2*moveAmt)
-            checkSqTwo, ch, p = self.findPinsOrChecks()
-            self.blackKingLocation = (r, c)
+        enemyColor = 'b' if allyPiece == 'w' else 'w'
+        checkSqOne = self.isSquareAttacked(r * 8 + c + moveAmt, enemyColor)
+        checkSqTwo = self.isSquareAttacked(r * 8 + c + 2*moveAmt, enemyColor)
         return checkSqOne, checkSqTwo
 
     def getKingSideCastleMoves(self, r, c, moves, allyPiece):
@@ -621,42 +976,85 @@ class GameState():
 
 
 class CastlingRights:
+    __slots__ = ("wks", "wqs", "bks", "bqs")
+
     def __init__(self, wks, wqs, bks, bqs):
         self.wks = wks
         self.bks = bks
         self.wqs = wqs
         self.bqs = bqs
 
+    """
+    The four rights as bits: 1 white king side, 2 white queen side, 4 black king side, 8 black queen side.
+    """
+    def toBits(self):
+        return (1 if self.wks else 0) | (2 if self.wqs else 0) | (4 if self.bks else 0) | (8 if self.bqs else 0)
+
+    def setBits(self, bits):
+        self.wks = bits & 1 != 0
+        self.wqs = bits & 2 != 0
+        self.bks = bits & 4 != 0
+        self.bqs = bits & 8 != 0
+
 
 
+newObject = object.__new__
+squareMoveIDs = [sq // 8 * 10 + sq % 8 for sq in range(64)] #a square's two digits in Move.moveID
+
 class Move:
+    #moves are created by the thousand at every search node, so they use slots instead of a per-object __dict__:
+    #smaller objects, faster attribute access and less work for the garbage collector
+    __slots__ = ("startcol", "startrow", "endcol", "endrow", "piecemoved", "piececaptured", "isCapture",
+                 "isPawnPromotion", "promotionPiece", "isEnPassantMove", "isCastleMove", "moveID", "isCheckMove")
     #maps rows and columns to chess notation for ranks and files respectively and vice versa.
     ranksToRows = {"1":7, "2":6, "3":5, "4":4, "5":3, "6":2, "7":1, "8":0}
     rowsToRanks = {v:k for k, v in ranksToRows.items()}
     filesToCols = {"a":0, "b":1, "c":2, "d":3, "e":4, "f":5, "g":6, "h":7}
     colsToFiles = {v:k for k, v in filesToCols.items()}
+    promotionPieces = "QRBN" #queen first, so it is the one a plain click on the back rank matches
+    #the promotion piece goes in the ten-thousands digit of moveID; a queen adds 0, so the ID of a move built from two
+    #clicks matches the queen promotion
+    promotionIDs = {piece: i * 10000 for i, piece in enumerate(promotionPieces)}
 
     #enpassantPossible is an optional parameter for making en passant move in a possible square
     #pawnMoves function passes coordinate value to this paramter, if no value is passed, by default it would be empty, set to ()
-    def __init__(self, startPos, endPos, board, isEnPassantMove=False, pawnPromotion=False, isCastleMove=False, isCheckMove=False): 
-        self.startcol = startPos[1]
-        self.startrow = startPos[0]
-        self.endcol = endPos[1]
-        self.endrow = endPos[0]
+    def __init__(self, startPos, endPos, board, isEnPassantMove=False, pawnPromotion=False, isCastleMove=False, isCheckMove=False, promotionPiece='Q'): 
+        self.startrow, self.startcol = startPos
+        self.endrow, self.endcol = endPos
         self.piecemoved = board[self.startrow][self.startcol]
         self.piececaptured = board[self.endrow][self.endcol]
         self.isCapture = self.piececaptured != '--'
         #Pawn Promotion
         self.isPawnPromotion = pawnPromotion
+        self.promotionPiece = promotionPiece
         #En Passant
         self.isEnPassantMove = isEnPassantMove
         #Castling
         self.isCastleMove = isCastleMove
-        self.moveID = self.startrow * 1000 + self.startcol * 100 + self.endrow * 10 + self.endcol
+        self.moveID = self.promotionIDs[promotionPiece] + self.startrow * 1000 + self.startcol * 100 + self.endrow * 10 + self.endcol
         #Checks
         self.isCheckMove = isCheckMove
         # print(self.moveID)
 
+    """
+    Quicker constructor for a generator that already knows the pieces: a move with no promotion, en passant or castling
+    from square fromSq to square toSq (row*8+col). Gives the same Move as the normal constructor.
+    """
+    @staticmethod
+    def plain(fromSq, toSq, piecemoved, piececaptured):
+        move = newObject(Move)
+        move.startrow = fromSq >> 3
+        move.startcol = fromSq & 7
+        move.endrow = toSq >> 3
+        move.endcol = toSq & 7
+        move.piecemoved = piecemoved
+        move.piececaptured = piececaptured
+        move.isCapture = piececaptured != '--'
+        move.isPawnPromotion = move.isEnPassantMove = move.isCastleMove = move.isCheckMove = False
+        move.promotionPiece = 'Q'
+        move.moveID = squareMoveIDs[fromSq] * 100 + squareMoveIDs[toSq]
+        return move
+
     def __eq__(self, other):
         if isinstance(other, Move):
             return self.moveID == other.moveID
@@ -677,9 +1075,9 @@ class Move:
             if self.isCapture:
                 return self.colsToFiles[self.startcol] + "x" + endSquare
             elif self.isPawnPromotion:
-                return endSquare + "Q" 
+                return endSquare + self.promotionPiece 
             elif self.isCapture and self.isPawnPromotion:
-                return self.colsToFiles[self.startcol] + "x" + endSquare + "Q"
+                return self.colsToFiles[self.startcol] + "x" + endSquare + self.promotionPiece
             elif self.isCheckMove:
                 return self.colsToFiles[self.startcol] + "+" + endSquare
             else:
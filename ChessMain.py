@@ -6,6 +6,9 @@ Day 1: Draw a chess board with static pieces.
 Day 2: Handle user input to move the pieces around the board.
 """
 import math
+import copy
+import queue
+import threading
 from shutil import move
 import pygame as pg
 import ChessEngine, AutomatedMoveFinder #To get reference to the state of the board
@@ -63,10 +66,13 @@ def main():
     clicksMade = []
     playerWhite = True #if its white's turn and a human is playing it, then set to true  if AI plays it, then set to false.
     playerBlack = False #if its black's turn and a human is playing it, then set to true  if AI plays it, then set to false.
+    aiThread = None #background thread searching for the AI move, None when the AI is not thinking
+    aiMoveQueue = None #the AI thread puts its move here; each search gets a new queue so a cancelled one is ignored
     while running:
         isHumanTurn = (gs.whiteToMove and playerWhite) or (not gs.whiteToMove and playerBlack)
         for event in pg.event.get():
             if event.type == pg.QUIT:
+                aiThread = cancelAISearch(aiThread)
                 running = False
             elif event.type == pg.MOUSEBUTTONDOWN:
                 if not gameOver and isHumanTurn:
@@ -93,17 +99,21 @@ def main():
             
             elif event.type == pg.KEYDOWN:
                 if event.key == pg.K_z:
+                    aiThread = cancelAISearch(aiThread)
                     if playerWhite and playerBlack:
                         gs.undoMove()
                     elif playerWhite or playerBlack:
                         gs.undoMove()
                         gs.undoMove()
+                    gameOver = False #an undone repetition or fifty-move draw is no longer over
                     moveMade = True #moves undoed or redoed also changes the gamestate
                     animate = False
                 elif event.key == pg.K_y:
+                    aiThread = cancelAISearch(aiThread)
                     gs.redoMove()
                     moveMade = True
                 elif event.key == pg.K_r:
+                    aiThread = cancelAISearch(aiThread)
                     gs = ChessEngine.GameState()
                     validMoves = gs.getValidMoves()
                     sqSelected = ()
@@ -111,15 +121,23 @@ def main():
                     gameOver = False
                     moveMade = False
                     animate = False
-        #AI move finder
-        if not gameOver and not isHumanTurn:
-            AI_moves = AutomatedMoveFinder.bestMoveNegaMaxAplhaBeta(gs, validMoves)
-            print(AI_moves.getChessNotation())
-            if AI_moves is None:
-                AI_moves = AutomatedMoveFinder.makeRandomMove(validMoves)
-            gs.makeMove(AI_moves)
-            moveMade = True 
-            animate = True
+        #AI move finder: the search runs in a background thread on a copy of the game state, so the window keeps
+        #drawing and handling events while it thinks
+        if running and not gameOver and not isHumanTurn and not moveMade:
+            if aiThread is None:
+                aiMoveQueue = queue.Queue()
+                aiThread = threading.Thread(target=findAIMove, args=(copy.deepcopy(gs), aiMoveQueue), daemon=True)
+                aiThread.start()
+            elif not aiMoveQueue.empty():
+                aiMove = aiMoveQueue.get()
+                aiThread = None
+                print(aiMove.getChessNotation())
+                for validMove in validMoves: #the search ran on a copy, so play the matching move of this game state
+                    if validMove.moveID == aiMove.moveID:
+                        gs.makeMove(validMove)
+                        moveMade = True
+                        animate = True
+                        break
 
         if moveMade: #since the gamestate changes after a valid move is made, so we must retrieve the list of new valid moves
             if animate:
@@ -129,13 +147,37 @@ def main():
         
         drawGameState(screen, gs, sqSelected, validMoves, moveLogFont)
 
+        drawReason = gs.drawReason()
         if gs.checkMate or gs.staleMate:
             gameOver = True
             drawGameOverText(screen, 'Stalemate' if gs.staleMate else "Black wins by checkmate" if gs.whiteToMove else "White wins by checkmate")
+        elif drawReason is not None:
+            gameOver = True
+            drawGameOverText(screen, "Draw by " + drawReason)
         
         clock.tick(MAX_FPS)
         pg.display.flip()
 
+'''
+Runs in the AI thread: searches gs (a copy of the game state) and puts the chosen move on moveQueue.
+'''
+def findAIMove(gs, moveQueue):
+    validMoves = gs.getValidMoves()
+    aiMove = AutomatedMoveFinder.bestMoveNegaMaxAplhaBeta(gs, validMoves)
+    if aiMove is None:
+        aiMove = AutomatedMoveFinder.makeRandomMove(validMoves)
+    moveQueue.put(aiMove)
+
+'''
+Stops the AI search running in aiThread (if any) and waits for the thread to finish, so that no two searches ever run
+at the same time. Returns None, the new value for aiThread.
+'''
+def cancelAISearch(aiThread):
+    while aiThread is not None and aiThread.is_alive():
+        AutomatedMoveFinder.stopSearch() #repeated in case the search had not started yet when it was first asked
+        aiThread.join(0.01)
+    return None
+
 '''
 Responsible for all graphics on the chess board, including chess pieces, square colors and even move suggestions and piece highlighting.
 '''
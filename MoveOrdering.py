@@ -0,0 +1,98 @@
+"""
+Move ordering for the alpha-beta search. Alpha-beta prunes the most when the best move is searched first, so before
+searching a node its moves are sorted by how promising they look:
+1) the best move stored for the position in the transposition table,
+2) pawn promotions,
+3) captures, most valuable victim first and, among equal victims, least valuable attacker first (MVV-LVA),
+4) killer moves: quiet moves that caused a beta cutoff at the same ply in another branch,
+5) every other quiet move by its history score, which grows each time that piece moving to that square caused a cutoff.
+
+The search talks to a MoveOrderer only through orderMoves() and recordCutoff(), so a different ordering scheme can be
+swapped in by replacing a Searcher's moveOrderer (see AutomatedMoveFinder) with any object providing those methods.
+"""
+
+TT_MOVE_SCORE = 1000000
+PROMOTION_SCORE = 900000
+CAPTURE_SCORE = 800000
+KILLER_SCORE = 700000
+HISTORY_LIMIT = 500000 #history scores are halved once one gets this big, so they stay below the killer scores
+KILLER_SLOTS = 2
+MAX_PLY = 64
+
+class MoveOrderer:
+    def __init__(self, pieceScore):
+        self.pieceScore = pieceScore
+        self.clear()
+
+    def clear(self):
+        self.killers = [[None] * KILLER_SLOTS for ply in range(MAX_PLY)]
+        self.history = {color + piece: [0] * 64 for color in "wb" for piece in "pNBRQK"}
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+
+    """
+    Called at the start of each root search. Killers are position specific so they are dropped; history is kept but
+    halved so that it follows the game.
+    """
+    def newSearch(self):
+        self.killers = [[None] * KILLER_SLOTS for ply in range(MAX_PLY)]
+        for table in self.history.values():
+            for sq in range(64):
+                table[sq] //= 2
+        self.cutoffs = 0
+        self.firstMoveCutoffs = 0
+
+    def scoreMove(self, move, ply, ttMoveID):
+        if move.moveID == ttMoveID:
+            return TT_MOVE_SCORE
+        if move.isCapture or move.isEnPassantMove:
+            victim = self.pieceScore['p'] if move.isEnPassantMove else self.pieceScore[move.piececaptured[1]]
+            score = CAPTURE_SCORE + 10 * victim - self.pieceScore[move.piecemoved[1]]
+            return score + PROMOTION_SCORE - CAPTURE_SCORE if move.isPawnPromotion and move.promotionPiece == 'Q' else score
+        if move.isPawnPromotion and move.promotionPiece == 'Q':
+            return PROMOTION_SCORE #underpromotions are ordered like quiet moves
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            for i in range(KILLER_SLOTS):
+                if killers[i] == move.moveID:
+                    return KILLER_SCORE - i
+        return self.history[move.piecemoved][move.endrow * 8 + move.endcol]
+
+    """
+    Returns the moves sorted best first. ply is the distance from the root, ttMoveID the moveID stored in the
+    transposition table for this position (or None).
+    """
+    def orderMoves(self, moves, ply, ttMoveID=None):
+        return sorted(moves, key=lambda move: self.scoreMove(move, ply, ttMoveID), reverse=True)
+
+    """
+    Called when the move at index moveIndex of the ordered list caused a beta cutoff at the given ply and depth.
+    """
+    def recordCutoff(self, move, ply, depth, moveIndex):
+        self.cutoffs += 1
+        if moveIndex == 0:
+            self.firstMoveCutoffs += 1
+        if move.isCapture or move.isEnPassantMove or move.isPawnPromotion:
+            return #captures and promotions are already ordered first
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move.moveID:
+                killers[1:] = killers[:-1]
+                killers[0] = move.moveID
+        table = self.history[move.piecemoved]
+        sq = move.endrow * 8 + move.endcol
+        table[sq] += depth * depth
+        if table[sq] > HISTORY_LIMIT:
+            for piecesTable in self.history.values():
+                for i in range(64):
+                    piecesTable[i] //= 2
+
+    """
+    Share of beta cutoffs produced by the first move searched; close to 1 means the ordering is doing its job.
+    """
+    def firstMoveCutoffRate(self):
+        return self.firstMoveCutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def stats(self):
+        return {"cutoffs": self.cutoffs, "firstMoveCutoffs": self.firstMoveCutoffs,
+                "firstMoveCutoffRate": self.firstMoveCutoffRate()}
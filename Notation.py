@@ -0,0 +1,91 @@
+"""
+Move notation for files and other programs: UCI long algebraic ("e2e4", "e7e8q") and standard algebraic notation
+("Nf3", "exd5", "O-O", "e8=Q+") as used in PGN. Move.__str__ stays the short form shown in the GUI's move log.
+"""
+
+"""
+UCI form of a move: from square, to square and, for a promotion, the lower case promotion piece.
+"""
+def moveToUci(move):
+    return move.getChessNotation() + (move.promotionPiece.lower() if move.isPawnPromotion else "")
+
+"""
+Finds the move in validMoves written as uci, or returns None.
+"""
+def uciToMove(uci, validMoves):
+    for move in validMoves:
+        if moveToUci(move) == uci:
+            return move
+    return None
+
+"""
+SAN of move, which must be one of validMoves, the legal moves of gs. Telling mate from check needs the move to be
+played, so for checking moves gs is briefly changed and then restored.
+"""
+def moveToSan(gs, move, validMoves):
+    if move.isCastleMove:
+        san = "O-O" if move.endcol > move.startcol else "O-O-O"
+    else:
+        pieceType = move.piecemoved[1]
+        endSquare = move.getRankFile(move.endcol, move.endrow)
+        isCapture = move.isCapture or move.isEnPassantMove
+        if pieceType == 'p':
+            san = (move.colsToFiles[move.startcol] + "x" if isCapture else "") + endSquare
+            if move.isPawnPromotion:
+                san += "=" + move.promotionPiece
+        else:
+            #another piece of the same kind that can reach the same square makes the move ambiguous
+            others = [other for other in validMoves if other.piecemoved == move.piecemoved and
+                      other.endrow == move.endrow and other.endcol == move.endcol and
+                      (other.startrow, other.startcol) != (move.startrow, move.startcol)]
+            disambiguation = ""
+            if others:
+                if all(other.startcol != move.startcol for other in others):
+                    disambiguation = move.colsToFiles[move.startcol]
+                elif all(other.startrow != move.startrow for other in others):
+                    disambiguation = move.rowsToRanks[move.startrow]
+                else:
+                    disambiguation = move.getRankFile(move.startcol, move.startrow)
+            san = pieceType + disambiguation + ("x" if isCapture else "") + endSquare
+    if gs.givesCheck(move):
+        moveRedo = gs.moveRedo
+        gs.moveRedo = [] #trying the move must not disturb the player's redo stack
+        gs.makeMove(move)
+        san += "#" if len(gs.getValidMoves()) == 0 else "+"
+        gs.undoMove()
+        gs.moveRedo = moveRedo
+    return san
+
+"""
+Finds the move in validMoves written in SAN, or returns None. Accepts what PGN files contain besides strict SAN: check
+and annotation marks ("+", "#", "!", "?"), castling with zeros ("0-0"), and promotions without "=" ("e8Q").
+"""
+def sanToMove(san, validMoves):
+    san = san.rstrip("+#!?")
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        kingSide = len(san) == 3
+        for move in validMoves:
+            if move.isCastleMove and (move.endcol > move.startcol) == kingSide:
+                return move
+        return None
+    promotionPiece = None
+    if "=" in san:
+        san, promotionPiece = san.split("=", 1)
+    elif len(san) > 2 and san[-1] in "QRBN" and san[0].islower():
+        san, promotionPiece = san[:-1], san[-1]
+    pieceType = san[0] if san[:1] in ("K", "Q", "R", "B", "N") else 'p'
+    squares = san.replace("x", "")[0 if pieceType == 'p' else 1:]
+    if len(squares) < 2 or squares[-2] not in "abcdefgh" or squares[-1] not in "12345678":
+        return None
+    endcol, endrow = "abcdefgh".index(squares[-2]), 8 - int(squares[-1])
+    disambiguation = squares[:-2] #a file, a rank or both; for pawns the file a capture starts from
+    for move in validMoves:
+        if move.piecemoved[1] != pieceType or move.endrow != endrow or move.endcol != endcol:
+            continue
+        if move.isPawnPromotion and move.promotionPiece != (promotionPiece or 'Q'):
+            continue
+        if any((d in "abcdefgh" and move.colsToFiles[move.startcol] != d) or
+               (d in "12345678" and move.rowsToRanks[move.startrow] != d) for d in disambiguation):
+            continue
+        return move
+    return None
@@ -0,0 +1,191 @@
+"""
+Opening book: known good moves for positions near the start of the game, so the engine can answer them at once instead
+of searching. The book is a binary file of fixed-size entries (Zobrist key, moveID, weight), sorted by key. It is
+memory-mapped and binary searched, so opening even a very large book reads nothing up front, and a lookup touches
+about log2(entries) pages.
+
+    python OpeningBook.py build games.pgn more.pgn --output book.bin --max-plies 20 --min-games 2
+    python OpeningBook.py probe book.bin --fen "<fen>"
+
+The keys are GameState.zobristKey values and the moves are Move.moveID values; both backends share them, so a book
+works with either. A weight is the number of games in the PGN files that played the move in the position.
+"""
+
+import argparse
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import Notation
+from BitboardEngine import backends
+from ChessEngine import STARTING_FEN
+
+#big-endian, so entries sorted by key are also sorted as bytes: 8 bytes of key, 2 of moveID, 2 of weight
+ENTRY = struct.Struct(">QHH")
+ENTRY_KEY = struct.Struct(">Q")
+MAX_WEIGHT = 0xFFFF
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size % ENTRY.size:
+            self.file.close()
+            raise ValueError("%s is not an opening book: its size is not a multiple of %d" % (path, ENTRY.size))
+        self.numEntries = size // ENTRY.size
+        #an empty file cannot be mapped, and has nothing to look up anyway
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def close(self):
+        if self.file is not None:
+            if self.numEntries:
+                self.data.close()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    """
+    Returns the (moveID, weight) entries stored for key, which is empty if the position is not in the book.
+    """
+    def entries(self, key):
+        data = self.data
+        low, high = 0, self.numEntries
+        while low < high: #find the first entry whose key is not below key
+            middle = (low + high) // 2
+            if ENTRY_KEY.unpack_from(data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self.numEntries:
+            entryKey, moveID, weight = ENTRY.unpack_from(data, low * ENTRY.size)
+            if entryKey != key:
+                break
+            found.append((moveID, weight))
+            low += 1
+        return found
+
+    """
+    A book move for gs out of validMoves, or None if the book has none. The move is picked at random in proportion to
+    its weight, so the engine does not always play the same opening; with pickBest it is the heaviest one. Entries
+    that match no valid move (a Zobrist key collision) are ignored.
+    """
+    def findMove(self, gs, validMoves, pickBest=False):
+        found = self.entries(gs.zobristKey)
+        if not found:
+            return None
+        movesByID = {move.moveID: move for move in validMoves}
+        candidates = [(movesByID[moveID], weight) for moveID, weight in found if moveID in movesByID and weight > 0]
+        if not candidates:
+            return None
+        if pickBest:
+            return max(candidates, key=lambda candidate: candidate[1])[0]
+        return random.choices([move for move, weight in candidates], [weight for move, weight in candidates])[0]
+
+"""
+Reads PGN text from file (any iterable of lines) and yields (headers, sanMoves) per game: the tag pairs as a dict and
+the main line as a list of SAN strings. Comments, variations, numeric annotations, move numbers and the result are
+left out.
+"""
+def readPgnGames(file):
+    headers, movetext = {}, []
+    for line in file:
+        line = line.strip()
+        if line.startswith("[") and line.endswith("]"):
+            if movetext: #a tag after movetext starts the next game
+                yield headers, pgnMainLine("\n".join(movetext))
+                headers, movetext = {}, []
+            match = re.match(r'\[(\w+)\s+"(.*)"\]$', line)
+            if match:
+                headers[match.group(1)] = match.group(2)
+        elif line and not line.startswith("%"):
+            movetext.append(line)
+    if headers or movetext:
+        yield headers, pgnMainLine("\n".join(movetext))
+
+def pgnMainLine(movetext):
+    sanMoves = []
+    variationDepth = 0
+    for token in re.findall(r"\{[^}]*\}|;[^\n]*|[()]|[^\s(){};]+", movetext):
+        if token == "(":
+            variationDepth += 1
+        elif token == ")":
+            variationDepth -= 1
+        elif variationDepth == 0 and token[0] not in "{;$" and token not in RESULTS:
+            token = re.sub(r"^\d+\.+", "", token) #move numbers, also when written against the move ("1.e4", "3...Nf6")
+            if token and not token.isdigit():
+                sanMoves.append(token)
+    return sanMoves
+
+"""
+Builds a book from PGN files: the first maxPlies moves of every game are replayed, and every (position, move) played
+in at least minGames games becomes an entry weighted by its game count. A game with an unreadable or illegal move
+contributes the moves before it. Returns (games, entries). The counts are gathered in memory, so for very large
+collections raise minGames or lower maxPlies.
+"""
+def buildBook(pgnPaths, bookPath, maxPlies=20, minGames=1, backend="bitboard"):
+    gs = backends[backend]()
+    counts = {}
+    games = 0
+    for pgnPath in pgnPaths:
+        with open(pgnPath, encoding="utf-8", errors="replace") as pgnFile:
+            for headers, sanMoves in readPgnGames(pgnFile):
+                games += 1
+                try:
+                    gs.load_fen(headers.get("FEN", STARTING_FEN))
+                except ValueError:
+                    continue
+                for san in sanMoves[:maxPlies]:
+                    move = Notation.sanToMove(san, gs.getValidMoves())
+                    if move is None:
+                        break
+                    entryKey = (gs.zobristKey, move.moveID)
+                    counts[entryKey] = counts.get(entryKey, 0) + 1
+                    gs.makeMove(move)
+    entries = sorted((key, moveID, min(count, MAX_WEIGHT)) for (key, moveID), count in counts.items()
+                     if count >= minGames)
+    with open(bookPath, "wb") as bookFile:
+        for entry in entries:
+            bookFile.write(ENTRY.pack(*entry))
+    return games, len(entries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query an opening book.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a book from PGN files")
+    build.add_argument("pgn", nargs="+", help="PGN files to read")
+    build.add_argument("--output", default="book.bin")
+    build.add_argument("--max-plies", type=int, default=20, help="plies of each game that go into the book")
+    build.add_argument("--min-games", type=int, default=1, help="leave out moves played in fewer games")
+    probe = commands.add_parser("probe", help="list the book moves of a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", default=STARTING_FEN)
+    args = parser.parse_args()
+    if args.command == "build":
+        games, entries = buildBook(args.pgn, args.output, args.max_plies, args.min_games)
+        print("%d games, %d entries written to %s" % (games, entries, args.output))
+    else:
+        gs = backends["bitboard"].from_fen(args.fen)
+        validMoves = gs.getValidMoves()
+        movesByID = {move.moveID: move for move in validMoves}
+        with OpeningBook(args.book) as book:
+            found = sorted(book.entries(gs.zobristKey), key=lambda entry: entry[1], reverse=True)
+        if not found:
+            print("position not in book")
+            sys.exit(1)
+        for moveID, weight in found:
+            move = movesByID.get(moveID)
+            print("%-8s %d" % (Notation.moveToSan(gs, move, validMoves) if move else "?%d" % moveID, weight))
+
+if __name__ == "__main__":
+    main()
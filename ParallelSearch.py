@@ -0,0 +1,164 @@
+"""
+Root-parallel search over a multiprocessing pool. The moves at the root are split across worker processes, each of
+which keeps its own GameState and Searcher (transposition table and move ordering tables) for as long as the pool lives. A worker is
+sent the root position as a FEN string, with the Zobrist keys of the positions since the last capture or pawn move so
+that it sees repetitions of the game before the root, plus one root move; it plays the move, searches the reply to
+the given depth and sends back the score. The parent merges the root scores and picks the best move.
+
+Per iteration the first (best ordered) root move is searched alone with the full window, and only then are the other
+root moves sent out, with alpha raised to that first score. Most of them then fail low quickly, just as they would in
+the serial search; searching them all with the full window from the start would cost far more nodes in total.
+
+    with ParallelSearch(workers=4) as search:
+        move = search.bestMove(gs, gs.getValidMoves(), maxDepth=5, timeLimitMs=10000)
+"""
+
+import multiprocessing
+import os
+import time
+import AutomatedMoveFinder
+import ChessEngine
+from MoveOrdering import MoveOrderer
+from PieceScores import pieceScore
+
+workerGameState = None #the GameState of a worker process, reloaded from a FEN and key history for every task
+workerSearcher = None #the worker's Searcher, whose tables live as long as the pool
+workerSearchID = None #the iteration the worker last searched for, so its tables are aged once per iteration
+
+def initWorker(gameStateClass, hashSizeMB, stopEvent):
+    global workerGameState, workerSearcher
+    workerGameState = gameStateClass()
+    workerSearcher = AutomatedMoveFinder.Searcher(hashSizeMB)
+    workerSearcher.stopEvent = stopEvent
+
+"""
+Runs in a worker: plays root move moveID in the position fen, reached through the positions whose keys are in
+history (GameState.repetitionHistory), and searches the reply to depth - 1 with the window
+(alpha, CHECKMATE), from the point of view of the side to move at the root. searchID identifies the iteration, so the
+worker ages its tables once per iteration. Returns (moveID, score, nodes); score is None if the
+deadline (a time.time() value) passed first.
+"""
+def searchRootMove(fen, history, moveID, depth, alpha, deadline, searchID):
+    global workerSearchID
+    gs = workerGameState
+    searcher = workerSearcher
+    gs.load_fen(fen, history)
+    if searchID != workerSearchID:
+        workerSearchID = searchID
+        searcher.transpositionTable.newSearch()
+        searcher.moveOrderer.newSearch()
+    move = None
+    for validMove in gs.getValidMoves():
+        if validMove.moveID == moveID:
+            move = validMove
+            break
+    turn = 1 if gs.whiteToMove else -1
+    #the child is searched as a non-root node of a depth-deep search, exactly as the serial search would see it
+    searcher.searchDepth = depth
+    searcher.nodeCount = 0
+    searcher.searchNodeLimit = None
+    searcher.searchDeadline = time.perf_counter() + (deadline - time.time()) if deadline is not None else None
+    searcher.searchStopped = False
+    gs.makeMove(move)
+    score = -searcher.negMaxMoveFindAlphaBeta(gs, None, depth - 1, -AutomatedMoveFinder.CHECKMATE, -alpha, -turn)
+    gs.undoMove()
+    searcher.searchDeadline = None
+    return moveID, None if searcher.searchStopped else score, searcher.nodeCount
+
+class ParallelSearch:
+    """
+    workers defaults to the number of CPUs. Each worker process gets a transposition table of hashSizeMB.
+    """
+    def __init__(self, workers=None, hashSizeMB=AutomatedMoveFinder.HASH_SIZE_MB, gameStateClass=ChessEngine.GameState):
+        self.workers = workers or os.cpu_count() or 1
+        self.stopEvent = multiprocessing.Event() #shared with the workers, see stop()
+        self.pool = multiprocessing.Pool(self.workers, initializer=initWorker,
+                                         initargs=(gameStateClass, hashSizeMB, self.stopEvent))
+        self.onIteration = None #called as onIteration(depth, score, [bestMove]) after each finished iteration
+        #orders the root moves for the first iteration (captures and promotions first); later iterations sort them by
+        #the scores of the one before
+        self.moveOrderer = MoveOrderer(pieceScore)
+        self.nodeCount = 0
+        self.bestScore = None
+        self.searchID = 0
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    """
+    Asks a running bestMove to stop, from another thread: the workers drop their searches within a few nodes and
+    bestMove returns the best move of the last finished iteration. As with Searcher.stop, a search that had not yet
+    started when this was called clears the request and runs anyway.
+    """
+    def stop(self):
+        self.stopEvent.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    """
+    Iterative deepening over the pool: every depth from 1 to maxDepth searches all root moves, the best of the last
+    iteration first. Stops early when timeLimitMs (milliseconds) runs out or stop() is called; an unfinished iteration
+    is thrown away, except that depth 1 always finishes. nodeLimit is only checked between iterations. Returns the best
+    move found, or None if validMoves is empty.
+    """
+    def bestMove(self, gs, validMoves, maxDepth=AutomatedMoveFinder.MAX_DEPTH, timeLimitMs=None, nodeLimit=None):
+        if not validMoves:
+            return None
+        fen = gs.to_fen()
+        history = gs.repetitionHistory()
+        movesByID = {move.moveID: move for move in validMoves}
+        rootOrder = [move.moveID for move in self.moveOrderer.orderMoves(validMoves, 0)]
+        startTime = time.time()
+        deadline = startTime + timeLimitMs / 1000 if timeLimitMs is not None else None
+        self.nodeCount = 0
+        self.stopEvent.clear()
+        bestMoveID = rootOrder[0]
+        for depth in range(1, maxDepth + 1):
+            iterationDeadline = deadline if depth > 1 else None
+            scores = self.searchIteration(fen, history, rootOrder, depth, iterationDeadline)
+            if scores is None:
+                break
+            #moves that failed low only have an upper bound, which is still below the best score, so sorting by the
+            #returned scores puts the best move first and keeps the rest in a sensible order for the next iteration
+            rootOrder.sort(key=lambda moveID: scores[moveID], reverse=True)
+            bestMoveID = rootOrder[0]
+            self.bestScore = scores[bestMoveID]
+            if self.onIteration is not None:
+                self.onIteration(depth, self.bestScore, [movesByID[bestMoveID]])
+            if abs(self.bestScore) >= AutomatedMoveFinder.CHECKMATE or len(rootOrder) <= 1:
+                break
+            if self.stopEvent.is_set() or (nodeLimit is not None and self.nodeCount >= nodeLimit):
+                break
+            #as in the serial search, do not start an iteration that cannot finish in time
+            if deadline is not None and time.time() + (time.time() - startTime) > deadline:
+                break
+        return movesByID[bestMoveID]
+
+    """
+    Searches every root move to depth: the first one with the full window, the rest in parallel with alpha set to the
+    first one's score. Returns a dict from moveID to score, or None if the deadline stopped the iteration.
+    """
+    def searchIteration(self, fen, history, rootOrder, depth, deadline):
+        checkmate = AutomatedMoveFinder.CHECKMATE
+        self.searchID += 1
+        moveID, score, nodes = self.pool.apply(searchRootMove, (fen, history, rootOrder[0], depth, -checkmate, deadline,
+                                                                self.searchID))
+        self.nodeCount += nodes
+        if score is None:
+            return None
+        scores = {moveID: score}
+        alpha = score
+        tasks = [(fen, history, moveID, depth, alpha, deadline, self.searchID) for moveID in rootOrder[1:]]
+        for moveID, score, nodes in self.pool.starmap(searchRootMove, tasks, chunksize=1):
+            self.nodeCount += nodes
+            if score is None:
+                return None
+            scores[moveID] = score
+        return scores
@@ -0,0 +1,130 @@
+"""
+Perft ("performance test") for the move generator: counts every leaf of the legal move tree down to a fixed depth.
+The counts for the reference positions below are known exactly, so any bug in getValidMoves shows up as a wrong
+number, and the time taken gives a nodes per second figure for comparing backends.
+
+    python Perft.py                                 run the reference suite on every backend
+    python Perft.py --backend bitboard --max-nodes 5000000
+    python Perft.py --depth 4                       plain perft of the start position
+    python Perft.py --divide 3 --fen "<fen>"        count per root move, to narrow down a wrong count
+"""
+
+import argparse
+import sys
+import time
+from BitboardEngine import backends
+from ChessEngine import STARTING_FEN
+
+'''
+(name, FEN, leaf counts for depth 1, 2, 3, ...). The first six are the standard positions from the chess programming
+wiki, the rest are short positions aimed at en passant, castling, promotion and pin edge cases.
+'''
+referencePositions = [
+    ("start position", STARTING_FEN, [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("position 4 mirrored", "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1", [6, 264, 9467, 422333]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594]),
+    ("illegal en passant 1", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1", [18, 92, 1670, 10138, 185429, 1134888]),
+    ("illegal en passant 2", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1", [13, 102, 1266, 10276, 135655, 1015133]),
+    ("en passant gives check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", [15, 126, 1928, 13931, 206379, 1440467]),
+    ("short castle gives check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1", [15, 66, 1198, 6399, 120330, 661072]),
+    ("long castle gives check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", [16, 71, 1286, 7418, 141077, 803711]),
+    ("castling rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", [26, 1141, 27826, 1274206]),
+    ("castling prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1", [44, 1494, 50509, 1720476]),
+    ("promote out of check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1", [11, 133, 1442, 19174, 266199, 3821001]),
+    ("discovered check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1", [29, 165, 5160, 31961, 1004658]),
+    ("promote to give check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1", [9, 40, 472, 2661, 38983, 217342]),
+    ("underpromote to check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1", [6, 27, 273, 1329, 18135, 92683]),
+    ("self stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1", [2, 6, 13, 63, 382, 2217]),
+    ("stalemate and checkmate 1", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1", [10, 25, 268, 926, 10857, 43261, 567584]),
+    ("stalemate and checkmate 2", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1", [37, 183, 6559, 23527]),
+]
+
+"""
+Number of leaf nodes depth plies below the current position. At depth 1 the moves are counted, not played.
+"""
+def perft(gs, depth):
+    moves = gs.getValidMoves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+"""
+Perft split by root move: returns a dict from move (in from-to notation, plus the promotion piece) to its leaf count.
+"""
+def divide(gs, depth):
+    counts = {}
+    for move in gs.getValidMoves():
+        name = move.getChessNotation() + (move.promotionPiece.lower() if move.isPawnPromotion else "")
+        gs.makeMove(move)
+        counts[name] = perft(gs, depth - 1)
+        gs.undoMove()
+    return counts
+
+"""
+Runs every reference position at the deepest depth whose known count is at most maxNodes. Returns True if every
+count matched.
+"""
+def runSuite(gameStateClass, maxNodes=200000, verbose=True):
+    allPassed = True
+    totalNodes = 0
+    totalTime = 0.0
+    gs = gameStateClass()
+    for name, fen, counts in referencePositions:
+        depth = max([1] + [i + 1 for i in range(len(counts)) if counts[i] <= maxNodes])
+        gs.load_fen(fen)
+        start = time.perf_counter()
+        nodes = perft(gs, depth)
+        elapsed = time.perf_counter() - start
+        passed = nodes == counts[depth - 1]
+        allPassed = allPassed and passed
+        totalNodes += nodes
+        totalTime += elapsed
+        if verbose:
+            print("%-26s depth %d  %9d nodes  expected %9d  %s  %8.0f nps" % (name, depth, nodes, counts[depth - 1],
+                  "ok  " if passed else "FAIL", nodes / elapsed if elapsed > 0 else 0))
+    if verbose:
+        print("%s: %d nodes in %.2fs, %.0f nodes per second, %s" % (gameStateClass.__name__, totalNodes, totalTime,
+              totalNodes / totalTime if totalTime > 0 else 0, "all passed" if allPassed else "FAILURES"))
+    return allPassed
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft node counts for the chess move generators.")
+    parser.add_argument("--backend", choices=sorted(backends), help="only test this backend (default: all)")
+    parser.add_argument("--fen", default=STARTING_FEN, help="position for --depth and --divide")
+    parser.add_argument("--depth", type=int, help="print the perft count of --fen at this depth")
+    parser.add_argument("--divide", type=int, metavar="DEPTH", help="print the count of --fen per root move")
+    parser.add_argument("--max-nodes", type=int, default=200000, help="largest expected count the suite will run")
+    args = parser.parse_args()
+    classes = [backends[args.backend]] if args.backend else list(backends.values())
+    allPassed = True
+    for gameStateClass in classes:
+        gs = gameStateClass.from_fen(args.fen)
+        if args.divide:
+            start = time.perf_counter()
+            counts = divide(gs, args.divide)
+            elapsed = time.perf_counter() - start
+            for move in sorted(counts):
+                print(move, counts[move])
+            print("%s: %d moves, %d nodes, %.0f nodes per second" % (gameStateClass.__name__, len(counts),
+                  sum(counts.values()), sum(counts.values()) / elapsed if elapsed > 0 else 0))
+        elif args.depth:
+            start = time.perf_counter()
+            nodes = perft(gs, args.depth)
+            elapsed = time.perf_counter() - start
+            print("%s: perft(%d) = %d, %.2fs, %.0f nodes per second" % (gameStateClass.__name__, args.depth, nodes,
+                  elapsed, nodes / elapsed if elapsed > 0 else 0))
+        else:
+            allPassed = runSuite(gameStateClass, args.max_nodes) and allPassed
+    sys.exit(0 if allPassed else 1)
+
+if __name__ == "__main__":
+    main()
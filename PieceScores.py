@@ -0,0 +1,68 @@
+"""
+Piece values and piece-square tables used to score a position. A piece is worth its pieceScore plus a tenth of its
+piece-square table entry; kings have no table. Shared by AutomatedMoveFinder and by GameState, which keeps running
+totals of these values as pieces move.
+"""
+pieceScore = {'Q':9, 'R':5, 'B':3, 'N':3, 'p':1, 'K':0}
+
+knightScores = [[1, 1, 1, 1, 1, 1, 1, 1],
+                [1, 2, 2, 2, 2, 2, 2, 1],
+                [1, 2, 3, 3, 3, 3, 2, 1],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [1, 2, 3, 3, 3, 3, 2, 1],
+                [1, 2, 2, 2, 2, 2, 2, 1],
+                [1, 1, 1, 1, 1, 1, 1, 1]]
+
+bishopScores = [[4, 3, 2, 1, 1, 2, 3, 4],
+                [3, 4, 3, 2, 2, 3, 4, 3],
+                [2, 3, 4, 3, 3, 4, 3, 2],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [2, 3, 4, 3, 3, 4, 3, 2],
+                [3, 4, 3, 2, 2, 3, 4, 3],
+                [4, 3, 2, 1, 1, 2, 3, 4]]
+
+queenScores = [[1, 1, 1, 3, 1, 1, 1, 1],
+               [1, 2, 3, 3, 3, 1, 1, 1],
+               [1, 4, 3, 3, 3, 4, 2, 1],
+               [1, 2, 3, 3, 3, 2, 2, 1],
+               [1, 2, 3, 3, 3, 2, 2, 1],
+               [1, 4, 3, 3, 3, 4, 2, 1],
+               [1, 2, 3, 3, 3, 1, 1, 1],
+               [1, 1, 1, 3, 1, 1, 1, 1]]
+
+rookScores = [[4, 3, 4, 4, 4, 4, 3, 4],
+              [4, 4, 4, 4, 4, 4, 4, 4],
+              [1, 1, 2, 3, 3, 2, 1, 1],
+              [1, 2, 3, 4, 4, 3, 2, 1],
+              [1, 2, 3, 4, 4, 3, 2, 1],
+              [1, 1, 2, 3, 3, 2, 1, 1],
+              [4, 4, 4, 4, 4, 4, 4, 4],
+              [4, 3, 4, 4, 4, 4, 3, 4]]
+
+whitePawnScores = [[8, 8, 8, 8, 8, 8, 8, 8],
+                   [8, 8, 8, 8, 8, 8, 8, 8],
+                   [5, 6, 6, 7, 7, 6, 6, 5],
+                   [2, 3, 3, 5, 5, 3, 3, 2],
+                   [1, 2, 3, 4, 4, 3, 2, 1],
+                   [1, 1, 2, 3, 3, 2, 1, 1],
+                   [1, 1, 1, 0, 0, 1, 1, 1],
+                   [0, 0, 0, 0, 0, 0, 0, 0]]
+
+blackPawnScores = whitePawnScores[::-1]
+
+piecePositionScores = {"N": knightScores, "B": bishopScores, "R": rookScores, "Q":queenScores, "wp": whitePawnScores, "bp":blackPawnScores}
+
+"""
+The same values laid out per full piece name ("wN", "bp", ...) and square (row * 8 + col), signed so that white pieces
+count positive and black pieces negative. materialValues are whole pawns, positionValues are tenths of a pawn.
+"""
+materialValues = {}
+positionValues = {}
+for color, sign in (("w", 1), ("b", -1)):
+    for pieceType in "pNBRQK":
+        piece = color + pieceType
+        table = piecePositionScores[piece] if pieceType == 'p' else piecePositionScores.get(pieceType)
+        materialValues[piece] = sign * pieceScore[pieceType]
+        positionValues[piece] = [sign * table[sq // 8][sq % 8] if table is not None else 0 for sq in range(64)]
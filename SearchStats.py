@@ -0,0 +1,207 @@
+"""
+Instrumentation for the alpha-beta search: what a search did and where its time went. Give a Searcher one and every
+root search it runs is recorded here, replacing the previous one:
+
+    searcher.stats = SearchStats(timings=True, trace=True)
+    searcher.bestMoveIterativeDeepening(gs, gs.getValidMoves(), 5000)
+    print(searcher.stats.summaryLine())
+    searcher.stats.writeJson("search.json")
+    searcher.stats.writeChromeTrace("search.trace.json")     (open in chrome://tracing or ui.perfetto.dev)
+
+Counted per ply from the root: main search nodes, leaves (nodes at the search horizon, which go on into the quiescence
+search), quiescence nodes, beta cutoffs, cutoffs by the first move searched and principal variation search re-searches
+(moves that failed high on their null window); also the root re-searches of aspiration windows. Per iteration of
+iterative deepening: nodes, time, score, best move and the effective branching factor, this iteration's nodes over the
+last one's.
+
+With timings the search's time is split into move generation (including check detection), evaluation and
+makeMove/undoMove. The time is measured by wrapping those methods of the searched GameState and the evaluation
+function for the length of the search, so a search without timings runs the plain methods at full speed; the
+wrappers themselves make a timed search somewhat slower. With trace, spans for each iteration and each root move are
+kept for export in the Chrome trace event format.
+
+A search without a SearchStats pays a single None check per node.
+"""
+
+import json
+import time
+
+MAX_PLY = 128 #deeper than the deepest iteration plus the quiescence search
+GENERATION, EVALUATION, MAKE_UNDO = range(3)
+generationMethods = ("getValidMoves", "getCaptureMoves", "getQuietMoves", "stagedMoves", "inCheck")
+
+class SearchStats:
+    def __init__(self, timings=True, trace=False):
+        self.timings = timings
+        self.trace = trace
+        self.clear()
+
+    def clear(self):
+        self.nodesByPly = [0] * MAX_PLY
+        self.leavesByPly = [0] * MAX_PLY
+        self.quiescenceNodesByPly = [0] * MAX_PLY
+        self.cutoffsByPly = [0] * MAX_PLY
+        self.firstMoveCutoffsByPly = [0] * MAX_PLY
+        self.researchesByPly = [0] * MAX_PLY
+        self.aspirationResearches = 0
+        self.times = [0.0, 0.0, 0.0] #seconds by GENERATION, EVALUATION, MAKE_UNDO
+        self.evaluations = 0
+        self.iterations = []
+        self.traceEvents = []
+        self.startTime = self.elapsed = 0.0
+        self.iterationStart = 0.0
+        self.iterationNodes = 0 #the Searcher's node count when the current iteration started
+
+    """
+    Called by the Searcher when a root search starts: clears the record and, with timings, wraps the methods of gs and
+    searcher that are timed. finish() must follow.
+    """
+    def start(self, gs, searcher):
+        self.clear()
+        self.startTime = self.iterationStart = time.perf_counter()
+        if self.timings:
+            self.nesting = [0, 0, 0]
+            for name in generationMethods:
+                wrap = self.timedGenerator if name == "stagedMoves" else self.timedCall
+                setattr(gs, name, wrap(getattr(gs, name), GENERATION))
+            gs.makeMove = self.timedCall(gs.makeMove, MAKE_UNDO)
+            gs.undoMove = self.timedCall(gs.undoMove, MAKE_UNDO)
+            self.plainEvaluate = searcher.evaluate
+            searcher.evaluate = self.timedCall(searcher.evaluate, EVALUATION, countCalls=True)
+
+    def finish(self, gs, searcher):
+        self.elapsed = time.perf_counter() - self.startTime
+        if self.timings:
+            for name in generationMethods + ("makeMove", "undoMove"):
+                del gs.__dict__[name] #uncovers the class's own methods again
+            searcher.evaluate = self.plainEvaluate
+
+    """
+    Wraps function so the time spent in it is added to times[index]. A call made from inside another timed call of
+    the same kind (getCaptureMoves calling getValidMoves, say) is not counted twice.
+    """
+    def timedCall(self, function, index, countCalls=False):
+        times, nesting, clock = self.times, self.nesting, time.perf_counter
+        stats = self
+        def timed(*args):
+            if nesting[index]:
+                return function(*args)
+            nesting[index] = 1
+            start = clock()
+            result = function(*args)
+            times[index] += clock() - start
+            nesting[index] = 0
+            if countCalls:
+                stats.evaluations += 1
+            return result
+        return timed
+
+    """
+    Like timedCall for a generator function: the time of producing each item is counted, not the time the caller
+    spends between items.
+    """
+    def timedGenerator(self, function, index):
+        times, nesting, clock = self.times, self.nesting, time.perf_counter
+        def timed(*args):
+            generator = function(*args)
+            while True:
+                nested = nesting[index]
+                nesting[index] = 1
+                start = clock()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    if not nested:
+                        times[index] += clock() - start
+                    nesting[index] = nested
+                yield item
+        return timed
+
+    """
+    Called by the Searcher after each finished iteration of depth with its score and best move.
+    """
+    def endIteration(self, depth, score, bestMove, nodeCount):
+        now = time.perf_counter()
+        nodes = nodeCount - self.iterationNodes
+        previous = self.iterations[-1]["nodes"] if self.iterations else 0
+        self.iterations.append({"depth": depth, "nodes": nodes, "seconds": now - self.iterationStart, "score": score,
+                                "bestMove": str(bestMove), "ebf": nodes / previous if previous else None})
+        if self.trace:
+            self.traceEvents.append({"name": "depth %d" % depth, "ph": "X", "pid": 0, "tid": 0,
+                                     "ts": (self.iterationStart - self.startTime) * 1e6,
+                                     "dur": (now - self.iterationStart) * 1e6,
+                                     "args": {"nodes": nodes, "score": score, "bestMove": str(bestMove)}})
+        self.iterationStart = now
+        self.iterationNodes = nodeCount
+
+    """
+    Called by the Searcher around each root move when trace is on; start is the time.perf_counter() value before it.
+    """
+    def traceRootMove(self, move, start, score):
+        self.traceEvents.append({"name": str(move), "ph": "X", "pid": 0, "tid": 1, "ts": (start - self.startTime) * 1e6,
+                                 "dur": (time.perf_counter() - start) * 1e6, "args": {"score": score}})
+
+    def cutoffs(self):
+        return sum(self.cutoffsByPly)
+
+    def firstMoveCutoffRate(self):
+        cutoffs = self.cutoffs()
+        return sum(self.firstMoveCutoffsByPly) / cutoffs if cutoffs else 0.0
+
+    """
+    The deepest iteration's nodes over the previous one's, or for a single fixed-depth search the depth-th root of its
+    nodes; None if there is nothing to measure.
+    """
+    def effectiveBranchingFactor(self):
+        if len(self.iterations) >= 2:
+            return self.iterations[-1]["ebf"]
+        if self.iterations and self.iterations[-1]["depth"] > 0:
+            return self.iterations[-1]["nodes"] ** (1 / self.iterations[-1]["depth"])
+        return None
+
+    def summary(self):
+        used = max([ply + 1 for ply in range(MAX_PLY) if self.nodesByPly[ply] or self.quiescenceNodesByPly[ply]] + [0])
+        nodes = sum(self.nodesByPly) + sum(self.quiescenceNodesByPly)
+        summary = {"depth": self.iterations[-1]["depth"] if self.iterations else 0, "nodes": sum(self.nodesByPly),
+                   "leaves": sum(self.leavesByPly), "quiescenceNodes": sum(self.quiescenceNodesByPly),
+                   "nodesByPly": self.nodesByPly[:used], "leavesByPly": self.leavesByPly[:used],
+                   "quiescenceNodesByPly": self.quiescenceNodesByPly[:used], "cutoffs": self.cutoffs(),
+                   "cutoffsByPly": self.cutoffsByPly[:used], "firstMoveCutoffRate": self.firstMoveCutoffRate(),
+                   "researches": sum(self.researchesByPly), "researchesByPly": self.researchesByPly[:used],
+                   "aspirationResearches": self.aspirationResearches,
+                   "effectiveBranchingFactor": self.effectiveBranchingFactor(), "iterations": self.iterations,
+                   "seconds": self.elapsed, "nodesPerSecond": nodes / self.elapsed if self.elapsed > 0 else 0.0}
+        if self.timings:
+            summary.update({"generationSeconds": self.times[GENERATION], "evaluationSeconds": self.times[EVALUATION],
+                            "makeUndoSeconds": self.times[MAKE_UNDO], "evaluations": self.evaluations,
+                            "otherSeconds": self.elapsed - sum(self.times)})
+        return summary
+
+    def summaryLine(self):
+        summary = self.summary()
+        ebf = summary["effectiveBranchingFactor"]
+        line = "depth %d  nodes %d (leaves %d, quiescence %d)  ebf %s  cutoffs %d (%.0f%% first move)  " \
+               "re-searches %d (aspiration %d)  %.3fs" % (
+            summary["depth"], summary["nodes"], summary["leaves"], summary["quiescenceNodes"],
+            "%.2f" % ebf if ebf is not None else "-", summary["cutoffs"], summary["firstMoveCutoffRate"] * 100,
+            summary["researches"], summary["aspirationResearches"], summary["seconds"])
+        if self.timings:
+            line += "  [generation %.3fs, evaluation %.3fs, make/undo %.3fs, other %.3fs]" % (
+                summary["generationSeconds"], summary["evaluationSeconds"], summary["makeUndoSeconds"],
+                summary["otherSeconds"])
+        return line
+
+    def writeJson(self, path):
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=1)
+
+    """
+    Writes the iteration and root move spans, plus the totals as metadata, in the Chrome trace event format.
+    """
+    def writeChromeTrace(self, path):
+        events = [{"name": "thread_name", "ph": "M", "pid": 0, "tid": 0, "args": {"name": "iterations"}},
+                  {"name": "thread_name", "ph": "M", "pid": 0, "tid": 1, "args": {"name": "root moves"}}]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events + self.traceEvents, "otherData": self.summary()}, file)
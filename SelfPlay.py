@@ -0,0 +1,185 @@
+"""
+Headless self-play: plays engine-vs-engine games across a process pool and streams each finished game to a PGN or JSONL
+file, reporting throughput as it goes. Each side has its own search settings (depth, time per move, evaluator).
+
+    python SelfPlay.py --games 100 --workers 4 --output games.pgn
+    python SelfPlay.py --games 1000 --white-depth 3 --black-depth 2 --black-eval material --output games.jsonl
+    python SelfPlay.py --games 20 --white-time 500 --black-time 500 --format jsonl --output timed.jsonl
+
+A game ends in checkmate, stalemate, threefold repetition or under the fifty-move rule, or is adjudicated a draw
+after --max-plies plies.
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+import AutomatedMoveFinder
+import Notation
+from BitboardEngine import backends
+
+MAX_TIMED_DEPTH = 64 #deepest iteration of a timed search given no depth; the clock is what stops it
+
+#evaluators a side can be given by name; names rather than functions go to the workers
+evaluators = {"default": AutomatedMoveFinder.board_score, "material": AutomatedMoveFinder.materialScore}
+
+"""
+Search settings of one side. depth is the fixed search depth, or with timeMs the deepest iteration allowed. Left out,
+it is MAX_DEPTH for a fixed-depth search and MAX_TIMED_DEPTH for a timed one, so the time limit is what ends the search.
+"""
+def playerSettings(depth=None, timeMs=None, evaluator="default"):
+    if depth is None:
+        depth = AutomatedMoveFinder.MAX_DEPTH if timeMs is None else MAX_TIMED_DEPTH
+    if evaluator not in evaluators:
+        raise ValueError("unknown evaluator " + repr(evaluator) + ", expected one of " + ", ".join(sorted(evaluators)))
+    return {"depth": depth, "timeMs": timeMs, "evaluator": evaluator}
+
+def playerName(settings):
+    name = "depth %d" % settings["depth"] if settings["timeMs"] is None else "%d ms" % settings["timeMs"]
+    return name + ("" if settings["evaluator"] == "default" else ", " + settings["evaluator"])
+
+"""
+Plays one game and returns its record: the moves in UCI and SAN, the result, why it ended, and search totals. Runs in
+a worker process; everything it needs comes in through the arguments so the game is reproducible from its seed.
+"""
+def playGame(gameNumber, white, black, backend, maxPlies, randomPlies, hashSizeMB, seed):
+    random.seed(seed) #the search shuffles root moves, so this fixes the whole game
+    gs = backends[backend]()
+    startFen = gs.to_fen()
+    searchers = {}
+    for color, settings in (("w", white), ("b", black)):
+        searchers[color] = AutomatedMoveFinder.Searcher(hashSizeMB, evaluate=evaluators[settings["evaluator"]])
+    uciMoves, sanMoves = [], []
+    nodes = 0
+    start = time.perf_counter()
+    validMoves = gs.getValidMoves()
+    while True:
+        if gs.checkMate:
+            result, termination = ("0-1" if gs.whiteToMove else "1-0"), "checkmate"
+            break
+        if gs.staleMate:
+            result, termination = "1/2-1/2", "stalemate"
+            break
+        drawReason = gs.drawReason()
+        if drawReason is not None:
+            result, termination = "1/2-1/2", drawReason
+            break
+        if len(uciMoves) >= maxPlies:
+            result, termination = "1/2-1/2", "max plies"
+            break
+        if len(uciMoves) < randomPlies:
+            move = AutomatedMoveFinder.makeRandomMove(validMoves) #opening variety
+        else:
+            settings = white if gs.whiteToMove else black
+            searcher = searchers["w" if gs.whiteToMove else "b"]
+            if settings["timeMs"] is None:
+                move = searcher.bestMoveNegaMaxAplhaBeta(gs, list(validMoves), settings["depth"])
+            else:
+                move = searcher.bestMoveIterativeDeepening(gs, list(validMoves), settings["timeMs"], None,
+                                                           settings["depth"])
+            nodes += searcher.nodeCount
+            if move is None:
+                move = AutomatedMoveFinder.makeRandomMove(validMoves)
+        sanMoves.append(Notation.moveToSan(gs, move, validMoves))
+        uciMoves.append(Notation.moveToUci(move))
+        gs.makeMove(move)
+        validMoves = gs.getValidMoves()
+    return {"game": gameNumber, "white": white, "black": black, "startFen": startFen, "result": result,
+            "termination": termination, "plies": len(uciMoves), "moves": uciMoves, "san": sanMoves,
+            "nodes": nodes, "seconds": round(time.perf_counter() - start, 3), "seed": seed}
+
+def playGameTask(task):
+    return playGame(*task)
+
+"""
+PGN text of a game record.
+"""
+def gameToPgn(record):
+    headers = [("Event", "Self-play"), ("Site", "?"), ("Date", datetime.date.today().strftime("%Y.%m.%d")),
+               ("Round", str(record["game"])), ("White", playerName(record["white"])),
+               ("Black", playerName(record["black"])), ("Result", record["result"]),
+               ("Termination", record["termination"]), ("PlyCount", str(record["plies"]))]
+    lines = ['[%s "%s"]' % header for header in headers]
+    tokens = []
+    for i, san in enumerate(record["san"]):
+        tokens.append(("%d. " % (i // 2 + 1) if i % 2 == 0 else "") + san)
+    tokens.append(record["result"])
+    movetext, line = [], ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            movetext.append(line)
+            line = token
+        else:
+            line = line + " " + token if line else token
+    movetext.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n\n"
+
+def gameToJson(record):
+    return json.dumps(record) + "\n"
+
+"""
+Plays the games over a pool of workers, writing each game to output (a file object) as soon as it finishes. Returns a
+summary with the score and the throughput.
+"""
+def runSelfPlay(games, white, black, output, outputFormat="pgn", workers=None, backend="bitboard", maxPlies=300,
+                randomPlies=2, hashSizeMB=4, seed=None, progressEvery=10):
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    tasks = [(i + 1, white, black, backend, maxPlies, randomPlies, hashSizeMB, seed + i) for i in range(games)]
+    write = gameToPgn if outputFormat == "pgn" else gameToJson
+    results = {"1-0": 0, "0-1": 0, "1/2-1/2": 0}
+    totalPlies = totalNodes = finished = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers or os.cpu_count() or 1) as pool:
+        for record in pool.imap_unordered(playGameTask, tasks):
+            output.write(write(record))
+            output.flush()
+            finished += 1
+            results[record["result"]] += 1
+            totalPlies += record["plies"]
+            totalNodes += record["nodes"]
+            if progressEvery and (finished % progressEvery == 0 or finished == games):
+                elapsed = time.perf_counter() - start
+                print("%d/%d games  +%d -%d =%d  %.0f games/hour  %.1f moves/sec" % (finished, games, results["1-0"],
+                      results["0-1"], results["1/2-1/2"], finished * 3600 / elapsed, totalPlies / elapsed),
+                      file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    return {"games": finished, "whiteWins": results["1-0"], "blackWins": results["0-1"], "draws": results["1/2-1/2"],
+            "plies": totalPlies, "nodes": totalNodes, "seconds": elapsed,
+            "gamesPerHour": finished * 3600 / elapsed if elapsed > 0 else 0.0,
+            "movesPerSecond": totalPlies / elapsed if elapsed > 0 else 0.0}
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine games without a display.")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--workers", type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--output", default="selfplay.pgn", help="file the games are appended to")
+    parser.add_argument("--format", choices=["pgn", "jsonl"], help="default: from the output file extension")
+    parser.add_argument("--backend", choices=sorted(backends), default="bitboard")
+    parser.add_argument("--max-plies", type=int, default=300, help="adjudicate a draw after this many plies")
+    parser.add_argument("--random-plies", type=int, default=2, help="random opening plies, so games differ")
+    parser.add_argument("--hash", type=int, default=4, help="transposition table size per side in MB")
+    parser.add_argument("--seed", type=int, help="seed of the first game; game i uses seed + i - 1")
+    for color in ("white", "black"):
+        parser.add_argument("--%s-depth" % color, type=int,
+                            help="search depth (default %d), or the deepest iteration with --%s-time (default: no "
+                                 "limit)" % (AutomatedMoveFinder.MAX_DEPTH, color))
+        parser.add_argument("--%s-time" % color, type=int, help="milliseconds per move (iterative deepening)")
+        parser.add_argument("--%s-eval" % color, choices=sorted(evaluators), default="default")
+    args = parser.parse_args()
+    outputFormat = args.format or ("jsonl" if args.output.endswith((".jsonl", ".json")) else "pgn")
+    white = playerSettings(args.white_depth, args.white_time, args.white_eval)
+    black = playerSettings(args.black_depth, args.black_time, args.black_eval)
+    with open(args.output, "a") as output:
+        summary = runSelfPlay(args.games, white, black, output, outputFormat, args.workers, args.backend,
+                              args.max_plies, args.random_plies, args.hash, args.seed)
+    print("%d games (+%d -%d =%d), %d moves in %.1fs: %.0f games/hour, %.1f moves/sec, %.0f nodes/sec" % (
+          summary["games"], summary["whiteWins"], summary["blackWins"], summary["draws"], summary["plies"],
+          summary["seconds"], summary["gamesPerHour"], summary["movesPerSecond"],
+          summary["nodes"] / summary["seconds"] if summary["seconds"] > 0 else 0))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Fixed size transposition table for the alpha-beta search. Positions are looked up by their Zobrist key
+(GameState.zobristKey), and each entry remembers the depth a position was searched to, its score, whether that score
+is exact or only a bound, and the best move found there.
+
+The table is split into buckets of two slots. The first slot is depth-preferred: it only gives way to a search at least
+as deep, or to anything once it is left over from an earlier search. The second slot is always replaced, so recent
+shallow results still get cached. Entries are stored in flat preallocated lists (one list per field), which keeps the
+table at a fixed size instead of growing a dict per position.
+"""
+
+EXACT = 0
+LOWER_BOUND = 1 #score is at least this much (the search failed high)
+UPPER_BOUND = 2 #score is at most this much (the search failed low)
+
+BUCKET_SIZE = 2
+#rough cost of one slot in CPython: a list pointer per field plus the key, score and move int/float objects
+ENTRY_BYTES = 128
+
+class TranspositionTable:
+    def __init__(self, sizeMB=16):
+        self.resize(sizeMB)
+
+    """
+    Reallocates the table to use about sizeMB megabytes. All stored entries are dropped.
+    """
+    def resize(self, sizeMB):
+        self.sizeMB = sizeMB
+        self.numBuckets = max(1, int(sizeMB * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SIZE))
+        self.clear()
+
+    def clear(self):
+        numSlots = self.numBuckets * BUCKET_SIZE
+        self.keys = [0] * numSlots
+        self.depths = [-1] * numSlots #-1 marks an empty slot
+        self.scores = [0] * numSlots
+        self.flags = [EXACT] * numSlots
+        self.moves = [None] * numSlots #moveID of the best move, None if there was none
+        self.ages = [0] * numSlots
+        self.age = 0
+        self.hits = self.misses = self.stores = self.overwrites = 0
+
+    """
+    Called once per root search so entries from earlier searches can be replaced even when they are deeper.
+    """
+    def newSearch(self):
+        self.age += 1
+
+    """
+    Returns (depth, score, flag, moveID) stored for key, or None.
+    """
+    def probe(self, key):
+        slot = (key % self.numBuckets) * BUCKET_SIZE
+        for i in range(slot, slot + BUCKET_SIZE):
+            if self.keys[i] == key and self.depths[i] >= 0:
+                self.hits += 1
+                return self.depths[i], self.scores[i], self.flags[i], self.moves[i]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, score, flag, moveID):
+        slot = (key % self.numBuckets) * BUCKET_SIZE
+        keys, depths = self.keys, self.depths
+        if keys[slot] == key or depths[slot] < 0 or depth >= depths[slot] or self.ages[slot] != self.age:
+            i = slot #depth-preferred slot
+        else:
+            i = slot + 1 #always-replace slot
+        if depths[i] >= 0 and keys[i] != key:
+            self.overwrites += 1
+        if moveID is None and keys[i] == key:
+            moveID = self.moves[i] #a fail-low search has no best move, so keep the old one for ordering
+        keys[i] = key
+        depths[i] = depth
+        self.scores[i] = score
+        self.flags[i] = flag
+        self.moves[i] = moveID
+        self.ages[i] = self.age
+        self.stores += 1
+
+    """
+    Hit/miss/overwrite counters, plus how full the table is, for sizing the table.
+    """
+    def stats(self):
+        probes = self.hits + self.misses
+        used = sum(1 for depth in self.depths if depth >= 0)
+        return {"sizeMB": self.sizeMB, "entries": len(self.keys), "used": used,
+                "hits": self.hits, "misses": self.misses, "hitRate": self.hits / probes if probes else 0.0,
+                "stores": self.stores, "overwrites": self.overwrites}
@@ -0,0 +1,245 @@
+"""
+UCI (Universal Chess Interface) front end, so tournament managers and analysis GUIs can run the engine headless:
+
+    python UCI.py
+
+Commands come in on stdin and answers go out on stdout. Supported: uci, isready, setoption (Hash, Threads, BookFile),
+ucinewgame, position startpos|fen <fen> [moves ...], go (depth, movetime, wtime, btime, winc, binc, movestogo, nodes,
+infinite), stop and quit. The search runs in a background thread, so isready and stop are answered while it thinks;
+a stop takes effect within LIMIT_CHECK_INTERVAL nodes and the engine then sends the best move of the last finished
+iteration. An info line with depth, score, nodes, nps, time and pv goes out after every iteration.
+
+With Threads above 1 the search is a ParallelSearch over that many worker processes, each with a Hash sized table.
+"""
+
+import sys
+import threading
+import time
+import AutomatedMoveFinder
+import Notation
+from BitboardEngine import BitboardGameState
+from ChessEngine import STARTING_FEN
+from OpeningBook import OpeningBook
+from ParallelSearch import ParallelSearch
+
+ENGINE_NAME = "Chess-Engine-Project"
+MAX_HASH_MB = 4096
+MAX_THREADS = 64
+MAX_SEARCH_DEPTH = 64
+MOVE_OVERHEAD_MS = 50 #kept back from the clock for the time it takes the move to reach the GUI
+DEFAULT_MOVES_TO_GO = 30 #without movestogo the remaining time is shared out as if this many moves were left
+
+"""
+UCI score of a search score (pawns, from the side to move's point of view): centipawns, or for a forced mate the number
+of moves to it, estimated from the length of the principal variation.
+"""
+def uciScore(score, principalVariation):
+    if abs(score) >= AutomatedMoveFinder.CHECKMATE:
+        mateIn = (max(len(principalVariation), 1) + 1) // 2
+        return "mate %d" % (mateIn if score > 0 else -mateIn)
+    return "cp %d" % round(score * 100)
+
+class UciEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.outputLock = threading.Lock() #the search thread writes info and bestmove lines too
+        self.gs = BitboardGameState()
+        self.hashSizeMB = AutomatedMoveFinder.HASH_SIZE_MB
+        self.threads = 1
+        self.book = None
+        self.searcher = AutomatedMoveFinder.Searcher(self.hashSizeMB)
+        self.searcher.onIteration = self.reportIteration
+        self.parallelSearch = None #the ParallelSearch used when threads > 1
+        self.searchThread = None
+        self.searchStart = 0.0
+        self.stopRequested = threading.Event() #an infinite search holds back its bestmove until this is set
+
+    def send(self, line):
+        with self.outputLock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    """
+    Carries out one command line. Returns False for quit.
+    """
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send("id name " + ENGINE_NAME)
+            self.send("id author the %s authors" % ENGINE_NAME)
+            self.send("option name Hash type spin default %d min 1 max %d" % (AutomatedMoveFinder.HASH_SIZE_MB,
+                                                                              MAX_HASH_MB))
+            self.send("option name Threads type spin default 1 min 1 max %d" % MAX_THREADS)
+            self.send("option name BookFile type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.stopSearch()
+            self.setOption(args)
+        elif command == "ucinewgame":
+            self.stopSearch()
+            self.searcher.transpositionTable.clear()
+            self.searcher.moveOrderer.clear()
+            self.gs.load_fen(STARTING_FEN)
+        elif command == "position":
+            self.stopSearch()
+            self.setPosition(args)
+        elif command == "go":
+            self.stopSearch()
+            self.go(args)
+        elif command == "stop":
+            self.stopSearch()
+        elif command == "quit":
+            self.stopSearch()
+            return False
+        else:
+            self.send("info string unknown command " + command)
+        return True
+
+    """
+    setoption name <name> [value <value>]; names and values may contain spaces.
+    """
+    def setOption(self, args):
+        if "name" not in args:
+            return
+        valueAt = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:valueAt]).lower()
+        value = " ".join(args[valueAt + 1:])
+        try:
+            if name == "hash":
+                self.hashSizeMB = min(max(int(value), 1), MAX_HASH_MB)
+                self.searcher.setHashSize(self.hashSizeMB)
+                self.startWorkers()
+            elif name == "threads":
+                self.threads = min(max(int(value), 1), MAX_THREADS)
+                self.startWorkers()
+            elif name == "bookfile":
+                if self.book is not None:
+                    self.book.close()
+                self.book = OpeningBook(value) if value and value != "<empty>" else None
+            else:
+                self.send("info string unknown option " + name)
+        except (ValueError, OSError) as error:
+            self.send("info string cannot set %s: %s" % (name, error))
+
+    """
+    (Re)creates the worker pool for the current Threads and Hash settings, or closes it when Threads is 1.
+    """
+    def startWorkers(self):
+        if self.parallelSearch is not None:
+            self.parallelSearch.close()
+            self.parallelSearch = None
+        if self.threads > 1:
+            self.parallelSearch = ParallelSearch(self.threads, self.hashSizeMB, BitboardGameState)
+            self.parallelSearch.onIteration = self.reportIteration
+
+    """
+    position startpos|fen <six FEN fields> [moves <uci> ...]. A move that is not legal stops the list there.
+    """
+    def setPosition(self, args):
+        movesAt = args.index("moves") if "moves" in args else len(args)
+        try:
+            if args[:1] == ["fen"]:
+                self.gs.load_fen(" ".join(args[1:movesAt]))
+            else:
+                self.gs.load_fen(STARTING_FEN)
+        except ValueError as error:
+            self.send("info string bad fen: %s" % error)
+            self.gs.load_fen(STARTING_FEN)
+            return
+        for uci in args[movesAt + 1:]:
+            move = Notation.uciToMove(uci, self.gs.getValidMoves())
+            if move is None:
+                self.send("info string illegal move " + uci)
+                break
+            self.gs.makeMove(move)
+
+    """
+    Starts the search in the background with the limits given to go.
+    """
+    def go(self, args):
+        limits = {}
+        for i in range(len(args) - 1):
+            if args[i] in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes"):
+                try:
+                    limits[args[i]] = int(args[i + 1])
+                except ValueError:
+                    pass
+        infinite = "infinite" in args
+        maxDepth = limits.get("depth", MAX_SEARCH_DEPTH)
+        timeLimitMs = None if infinite else limits.get("movetime", self.timeForMove(limits))
+        self.stopRequested.clear()
+        self.searchStart = time.perf_counter()
+        self.searchThread = threading.Thread(target=self.search, args=(maxDepth, timeLimitMs, limits.get("nodes"),
+                                                                       infinite), daemon=True)
+        self.searchThread.start()
+
+    """
+    Milliseconds to spend on this move from the clock limits of go, or None if no clock was given.
+    """
+    def timeForMove(self, limits):
+        remaining = limits.get("wtime" if self.gs.whiteToMove else "btime")
+        if remaining is None:
+            return None
+        increment = limits.get("winc" if self.gs.whiteToMove else "binc", 0)
+        budget = remaining // max(limits.get("movestogo", DEFAULT_MOVES_TO_GO), 1) + increment * 3 // 4
+        return max(1, min(budget, remaining - MOVE_OVERHEAD_MS))
+
+    """
+    Runs in the search thread and ends by sending bestmove.
+    """
+    def search(self, maxDepth, timeLimitMs, nodeLimit, infinite):
+        validMoves = self.gs.getValidMoves()
+        move = self.book.findMove(self.gs, validMoves) if self.book is not None and validMoves else None
+        if move is None and validMoves:
+            if self.parallelSearch is not None:
+                move = self.parallelSearch.bestMove(self.gs, validMoves, maxDepth, timeLimitMs, nodeLimit)
+            else:
+                move = self.searcher.bestMoveIterativeDeepening(self.gs, list(validMoves), timeLimitMs, nodeLimit,
+                                                                maxDepth)
+        if infinite:
+            self.stopRequested.wait() #the protocol wants no bestmove before the stop of an infinite search
+        self.send("bestmove " + (Notation.moveToUci(move) if move is not None else "0000"))
+
+    def reportIteration(self, depth, score, principalVariation):
+        elapsed = time.perf_counter() - self.searchStart
+        search = self.parallelSearch if self.parallelSearch is not None else self.searcher
+        self.send("info depth %d score %s nodes %d nps %d time %d pv %s" % (depth, uciScore(score, principalVariation),
+                  search.nodeCount, search.nodeCount / elapsed if elapsed > 0 else 0, elapsed * 1000,
+                  " ".join(Notation.moveToUci(move) for move in principalVariation)))
+
+    """
+    Stops the running search, if any, and waits for it to send its bestmove.
+    """
+    def stopSearch(self):
+        self.stopRequested.set()
+        search = self.parallelSearch if self.parallelSearch is not None else self.searcher
+        while self.searchThread is not None and self.searchThread.is_alive():
+            search.stop() #repeated in case the search had not started yet when it was first asked
+            self.searchThread.join(0.01)
+        self.searchThread = None
+
+    def close(self):
+        self.stopSearch()
+        if self.parallelSearch is not None:
+            self.parallelSearch.close()
+            self.parallelSearch = None
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+
+def main():
+    engine = UciEngine()
+    try:
+        for line in sys.stdin:
+            if not engine.handle(line):
+                break
+    finally:
+        engine.close()
+
+if __name__ == "__main__":
+    main()